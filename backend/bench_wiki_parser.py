@@ -0,0 +1,200 @@
+"""
+Wiki parser benchmark
+
+Times parse_markdown_links against the previous line-splitting parser on
+synthetic wikis from 1 KB to 10 MB, after checking both give the same
+groups:
+
+    python bench_wiki_parser.py
+    python bench_wiki_parser.py --sizes 1K 1M --min-time 2
+
+"parse" builds ProductGroup models; "groups" is the model-free pass the
+dashboard cache serializes from (iter_link_groups).
+"""
+import argparse
+import random
+import re
+import time
+from typing import Callable, List
+from models import ProductGroup, LinkItem
+from wiki import parse_markdown_links, iter_link_groups
+
+SIZE_UNITS = {'K': 1024, 'M': 1024 * 1024}
+
+
+def legacy_parse_markdown_links(content: str) -> List[ProductGroup]:
+    """
+    parse_markdown_links as it was before the single-pass parser, kept
+    verbatim as the baseline
+    """
+    groups = []
+    lines = content.split('\n')
+
+    current_product = None
+    current_env = None
+    current_links = []
+
+    for i, line in enumerate(lines):
+        original_line = line
+        line = line.strip()
+
+        # Skip empty lines
+        if not line:
+            continue
+
+        # Debug first 30 non-empty lines
+        if i < 30:
+            pass  # No debug logging
+
+        # Detect product header (# Title)
+        if original_line.startswith('# '):
+            # Save previous group if exists
+            if current_product and current_env and current_links:
+                groups.append(ProductGroup(
+                    country="",
+                    product=current_product,
+                    environment=current_env,
+                    links=current_links
+                ))
+                current_links = []
+                current_env = None
+
+            # Parse new product header
+            current_product = line[2:].strip()  # Remove "# " prefix
+
+        # Detect environment/version header (## Title)
+        elif original_line.startswith('## '):
+            # Save previous environment group if exists
+            if current_product and current_env and current_links:
+                groups.append(ProductGroup(
+                    country="",
+                    product=current_product,
+                    environment=current_env,
+                    links=current_links
+                ))
+                current_links = []
+
+            # Set new environment
+            current_env = line[3:].strip()  # Remove "## " prefix
+
+        # Detect markdown links in bullet points
+        elif (line.startswith('*') or line.startswith('-')) and '[' in line and '](' in line:
+            link_pattern = r'\[([^\]]+)\]\(([^\)]+)\)'
+            matches = re.findall(link_pattern, line)
+
+            for text, url in matches:
+                link = LinkItem(text=text.strip(), url=url.strip())
+                current_links.append(link)
+
+    # Add last group
+    if current_product and current_env and current_links:
+        groups.append(ProductGroup(
+            country="",
+            product=current_product,
+            environment=current_env,
+            links=current_links
+        ))
+
+    return groups
+
+
+def synthetic_wiki(size: int, seed: int = 0) -> str:
+    """
+    Markdown of roughly size bytes shaped like a customer links page:
+    products, environments and bullet links (some indented or with several
+    links), plus prose and table rows the parser has to skip
+    """
+    rng = random.Random(seed)
+    parts = []
+    total = 0
+    product = 0
+
+    while total < size:
+        product += 1
+        block = [f"# Product {product}", "", "Links for this product, maintained by the team.", ""]
+        for env in ("Production", "Homologation", "Development")[:rng.randint(1, 3)]:
+            block.append(f"## {env}")
+            for i in range(rng.randint(5, 40)):
+                host = f"app{product}-{i}.{env.lower()}.example.com"
+                kind = rng.random()
+                if kind < 0.6:
+                    block.append(f"* [Service {i}](https://{host}:{8000 + i}/login)")
+                elif kind < 0.75:
+                    block.append(f"  - [API {i}](http://{host}/api) | [Docs](http://{host}/docs)")
+                elif kind < 0.9:
+                    block.append(f"| {host} | [Admin](https://{host}/admin) | owner |")
+                else:
+                    block.append(f"Notes about {host}, ask the on-call engineer before restarts.")
+            block.append("")
+        text = "\n".join(block) + "\n"
+        parts.append(text)
+        total += len(text)
+
+    return "".join(parts)[:size]
+
+
+def parse_size(value: str) -> int:
+    unit = value[-1].upper()
+    if unit in SIZE_UNITS:
+        return int(float(value[:-1]) * SIZE_UNITS[unit])
+    return int(value)
+
+
+def best_time(fn: Callable[[str], object], content: str, min_time: float) -> float:
+    """Fastest of repeated runs, repeating for at least min_time seconds"""
+    best = float('inf')
+    spent = 0.0
+    runs = 0
+    while spent < min_time or runs < 3:
+        started = time.perf_counter()
+        fn(content)
+        elapsed = time.perf_counter() - started
+        best = min(best, elapsed)
+        spent += elapsed
+        runs += 1
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the wiki markdown parser")
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        default=["1K", "10K", "100K", "1M", "10M"],
+        help="Wiki sizes in bytes, with an optional K or M suffix (default: 1K to 10M)"
+    )
+    parser.add_argument(
+        "--min-time",
+        type=float,
+        default=1.0,
+        help="Seconds to spend timing each parser per size (default: 1)"
+    )
+    args = parser.parse_args()
+
+    parsers = [
+        ("legacy", legacy_parse_markdown_links),
+        ("parse", parse_markdown_links),
+        ("groups", lambda content: list(iter_link_groups(content))),
+    ]
+
+    print(f"{'size':>6} {'links':>8} " + " ".join(f"{name + ' MB/s':>12}" for name, _ in parsers) + f" {'speedup':>8}")
+    for size_arg in args.sizes:
+        content = synthetic_wiki(parse_size(size_arg))
+
+        expected = [group.model_dump() for group in legacy_parse_markdown_links(content)]
+        if [group.model_dump() for group in parse_markdown_links(content)] != expected:
+            raise SystemExit(f"Parsers disagree on the {size_arg} wiki")
+
+        megabytes = len(content.encode()) / (1024 * 1024)
+        times = [best_time(fn, content, args.min_time) for _, fn in parsers]
+        links = sum(len(group['links']) for group in expected)
+
+        print(
+            f"{size_arg:>6} {links:>8} "
+            + " ".join(f"{megabytes / elapsed:>12.1f}" for elapsed in times)
+            + f" {times[0] / times[1]:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,165 @@
 """
 Cache management functionality
 """
-import sqlite3
+import hashlib
 from datetime import datetime, timedelta
-from typing import Optional
-from config import DB_NAME, CACHE_EXPIRY_MINUTES
+from typing import Dict, List, Optional
+from config import (
+    CACHE_BACKEND, CACHE_EXPIRY_MINUTES, CACHE_MAX_BYTES,
+    CACHE_MEMORY_MAX_ENTRIES, CACHE_MEMORY_MAX_BYTES, CACHE_MEMORY_TTL_SECONDS
+)
+from cache_backends import create_cache_backend, ENTRY_TTL_SECONDS
+from memory_cache import MemoryLRU
 
+# Where entries live: SQLite (default), process memory or Redis
+backend = create_cache_backend(CACHE_BACKEND)
 
-def get_cached_content(url: str, max_age_minutes: int = CACHE_EXPIRY_MINUTES) -> Optional[str]:
+# In-process tier in front of the backend: validators and parsed groups
+# per URL (not the raw content), written through on every cache write.
+# The memory backend needs no tier in front of it, so it stays empty there.
+memory_tier = MemoryLRU(CACHE_MEMORY_MAX_ENTRIES, CACHE_MEMORY_MAX_BYTES, CACHE_MEMORY_TTL_SECONDS)
+
+
+def _remember(url: str, record: Dict):
+    if backend.name != "memory":
+        memory_tier.set(url, record, len(url) + len(record['groups_json'] or '') + 256)
+
+
+async def get_cached_content(url: str, max_age_minutes: int = CACHE_EXPIRY_MINUTES) -> Optional[str]:
     """
     Get cached content if not expired
     """
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
+    entry = await get_cache_entry(url, max_age_minutes)
+    if not entry or not entry['fresh']:
+        return None
 
-    c.execute('SELECT content, cached_at FROM cache WHERE url = ?', (url,))
-    result = c.fetchone()
-    conn.close()
+    return await read_cached_content(url)
 
-    if not result:
-        return None
 
-    content, cached_at = result
-    cached_time = datetime.fromisoformat(cached_at)
+async def get_cache_entry(url: str, max_age_minutes: int = CACHE_EXPIRY_MINUTES) -> Optional[Dict]:
+    """
+    Get a cache entry's validators and parsed groups, expired or not.
+    The raw content is left out - hot hits are served from groups_json,
+    straight from the memory tier when the URL is in it.
+    """
+    record = memory_tier.get(url)
 
-    if datetime.now() - cached_time > timedelta(minutes=max_age_minutes):
-        return None
+    if record is None:
+        record = await backend.get_entry(url)
+        if record is None:
+            return None
+        _remember(url, record)
+
+    age = datetime.now() - record['cached_at']
+
+    return dict(
+        record,
+        content=None,
+        age_seconds=age.total_seconds(),
+        fresh=age <= timedelta(minutes=max_age_minutes)
+    )
+
+
+async def read_cached_content(url: str) -> Optional[str]:
+    """Get cached raw content regardless of age"""
+    return await backend.get_content(url)
+
+
+async def cache_parsed(url: str, content_hash: str, groups_json: str):
+    """
+    Cache serialized groups parsed from a URL's content with the given hash
+    """
+    await backend.store_parsed(url, content_hash, groups_json)
 
-    return content
+    for cached_url, record in memory_tier.items():
+        if record['content_hash'] == content_hash and record['groups_json'] is None:
+            _remember(cached_url, dict(record, groups_json=groups_json))
 
 
-def cache_content(url: str, content: str):
+def hash_content(content: str) -> str:
+    """Hash wiki content, used to spot unchanged pages when there are no validators"""
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+async def cache_content(url: str, content: str, etag: Optional[str] = None,
+                        last_modified: Optional[str] = None) -> datetime:
     """
-    Cache wiki content
+    Cache wiki content along with its HTTP validators; returns the cache time
     """
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
+    cached_at = datetime.now()
+    record = {
+        "cached_at": cached_at,
+        "etag": etag,
+        "last_modified": last_modified,
+        "content_hash": hash_content(content),
+        "groups_json": None
+    }
+    await backend.store(url, content, record)
+    _remember(url, record)
+    return cached_at
+
 
-    c.execute('''
-        INSERT OR REPLACE INTO cache (url, content, cached_at)
-        VALUES (?, ?, ?)
-    ''', (url, content, datetime.now()))
+async def touch_cache(url: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> datetime:
+    """
+    Mark a cache entry as revalidated - upstream content is unchanged
+    """
+    cached_at = datetime.now()
+    await backend.touch(url, cached_at, etag, last_modified)
 
-    conn.commit()
-    conn.close()
+    # Keep the memory copy in step
+    record = memory_tier.get(url)
+    if record is not None:
+        _remember(url, dict(
+            record,
+            cached_at=cached_at,
+            etag=etag or record['etag'],
+            last_modified=last_modified or record['last_modified']
+        ))
+    return cached_at
 
 
-def clear_all_cache():
+async def invalidate_cache(urls: List[str]) -> int:
+    """Drop the cache entries for the given URLs; returns how many existed"""
+    for url in urls:
+        memory_tier.delete(url)
+    return await backend.delete(urls)
+
+
+async def clear_all_cache():
     """Clear entire cache"""
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('DELETE FROM cache')
-    conn.commit()
-    conn.close()
+    memory_tier.clear()
+    await backend.clear()
+
+
+async def expire_all_cache() -> int:
+    """
+    Mark every entry as just expired without dropping it: it is served stale
+    while it is revalidated, instead of every wiki missing at once.
+    Returns how many entries were expired.
+    """
+    memory_tier.clear()
+    return await backend.expire(datetime.now() - timedelta(minutes=CACHE_EXPIRY_MINUTES, seconds=1))
+
+
+async def sweep_cache() -> Dict[str, int]:
+    """
+    Expire entries past the hard staleness limit and evict the least recently
+    used ones past CACHE_MAX_BYTES; returns how many were dropped.
+    Backends do their storage I/O off the event loop; the memory tier is
+    only ever changed here, on it.
+    """
+    expired, evicted = await backend.sweep(CACHE_MAX_BYTES, ENTRY_TTL_SECONDS)
+    for url in expired + evicted:
+        memory_tier.delete(url)
+    memory_tier.expire()
+    return {"expired": len(expired), "evicted": len(evicted)}
+
+
+async def cache_stats() -> Dict:
+    """Sizes and entry counts of the cache backend and the memory tier"""
+    return {
+        "backend": backend.name,
+        "maxBytes": CACHE_MAX_BYTES,
+        **(await backend.stats()),
+        "memoryTier": memory_tier.stats()
+    }
@@ -0,0 +1,638 @@
+"""
+Wiki cache storage backends - SQLite, in-memory and Redis
+"""
+import asyncio
+import logging
+import sqlite3
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple, Union
+from config import (
+    DB_NAME, CACHE_MAX_STALENESS_MINUTES, CACHE_MEMORY_MAX_ENTRIES, CACHE_MAX_BYTES, CACHE_COMPRESSION_LEVEL,
+    REDIS_HOST, REDIS_PORT, REDIS_DB, REDIS_PASSWORD, REDIS_KEY_PREFIX, REDIS_TIMEOUT_SECONDS, REDIS_RETRY_SECONDS
+)
+from memory_cache import MemoryLRU
+
+try:
+    import redis
+    import redis.asyncio as redis_asyncio
+except ImportError:
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Entries past the hard staleness limit are never served, so no backend keeps them longer
+ENTRY_TTL_SECONDS = CACHE_MAX_STALENESS_MINUTES * 60
+
+
+def compress_content(content: str) -> bytes:
+    return zlib.compress(content.encode(), CACHE_COMPRESSION_LEVEL)
+
+
+def decompress_content(data: Union[str, bytes]) -> str:
+    """Stored content back to text - rows written before compression are returned as they are"""
+    if isinstance(data, str):
+        return data
+    try:
+        return zlib.decompress(data).decode()
+    except zlib.error:
+        return data.decode()
+
+
+class CacheBackend:
+    """
+    Storage for wiki cache entries: the raw API response per URL with its
+    validators, and the serialized groups parsed from it.
+
+    Records returned by get_entry hold cached_at, etag, last_modified,
+    content_hash and groups_json (None until the content was parsed).
+    Content is stored compressed.
+    """
+
+    name = "base"
+
+    async def get_entry(self, url: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    async def get_content(self, url: str) -> Optional[str]:
+        raise NotImplementedError
+
+    async def store(self, url: str, content: str, record: Dict):
+        raise NotImplementedError
+
+    async def touch(self, url: str, cached_at: datetime, etag: Optional[str], last_modified: Optional[str]):
+        """Update the time and validators of an unchanged entry, if it still exists"""
+        raise NotImplementedError
+
+    async def store_parsed(self, url: str, content_hash: str, groups_json: str):
+        raise NotImplementedError
+
+    async def delete(self, urls: List[str]) -> int:
+        raise NotImplementedError
+
+    async def clear(self):
+        raise NotImplementedError
+
+    async def expire(self, cached_at: datetime) -> int:
+        """
+        Back-date entries cached after cached_at to it, keeping their content
+        and validators; returns how many were changed
+        """
+        raise NotImplementedError
+
+    async def sweep(self, max_bytes: int, max_age_seconds: int) -> Tuple[List[str], List[str]]:
+        """
+        Drop entries older than max_age_seconds, then evict entries until the
+        stored size fits max_bytes; returns the expired and the evicted URLs
+        """
+        raise NotImplementedError
+
+    async def stats(self) -> Dict[str, int]:
+        """Entry counts and stored (compressed) and raw sizes in bytes"""
+        raise NotImplementedError
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    The cache and parsed_cache tables of the application database. Every
+    query runs in a worker thread, so a busy database never blocks the
+    event loop. The sweeper evicts by accessed_at, least recent first.
+    Reads stay a plain SELECT: their times are buffered here and written by
+    the next sweep, so a read never waits on another writer's lock.
+    """
+
+    name = "sqlite"
+
+    def __init__(self):
+        self._accessed: Dict[str, datetime] = {}
+
+    async def get_entry(self, url: str) -> Optional[Dict]:
+        record = await asyncio.to_thread(self._get_entry, url)
+        if record is not None:
+            self._accessed[url] = datetime.now()
+        return record
+
+    def _get_entry(self, url: str) -> Optional[Dict]:
+        conn = sqlite3.connect(DB_NAME)
+        c = conn.cursor()
+
+        c.execute('''
+            SELECT c.cached_at, c.etag, c.last_modified, c.content_hash, p.groups_json
+            FROM cache c
+            LEFT JOIN parsed_cache p ON p.content_hash = c.content_hash
+            WHERE c.url = ?
+        ''', (url,))
+        result = c.fetchone()
+        conn.close()
+
+        if not result:
+            return None
+
+        cached_at, etag, last_modified, content_hash, groups_json = result
+        return {
+            "cached_at": datetime.fromisoformat(cached_at),
+            "etag": etag,
+            "last_modified": last_modified,
+            "content_hash": content_hash,
+            "groups_json": groups_json
+        }
+
+    async def get_content(self, url: str) -> Optional[str]:
+        return await asyncio.to_thread(self._get_content, url)
+
+    def _get_content(self, url: str) -> Optional[str]:
+        conn = sqlite3.connect(DB_NAME)
+        c = conn.cursor()
+        c.execute('SELECT content FROM cache WHERE url = ?', (url,))
+        result = c.fetchone()
+        conn.close()
+        return decompress_content(result[0]) if result and result[0] is not None else None
+
+    async def store(self, url: str, content: str, record: Dict):
+        await asyncio.to_thread(self._store, url, content, record)
+
+    def _store(self, url: str, content: str, record: Dict):
+        data = compress_content(content)
+        conn = sqlite3.connect(DB_NAME)
+        c = conn.cursor()
+
+        c.execute('''
+            INSERT OR REPLACE INTO cache
+                (url, content, cached_at, etag, last_modified, content_hash, size, raw_size, accessed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            url, data, record['cached_at'], record['etag'], record['last_modified'], record['content_hash'],
+            len(data), len(content.encode()), record['cached_at']
+        ))
+
+        conn.commit()
+        conn.close()
+
+    async def touch(self, url: str, cached_at: datetime, etag: Optional[str], last_modified: Optional[str]):
+        await asyncio.to_thread(self._touch, url, cached_at, etag, last_modified)
+
+    def _touch(self, url: str, cached_at: datetime, etag: Optional[str], last_modified: Optional[str]):
+        conn = sqlite3.connect(DB_NAME)
+        c = conn.cursor()
+
+        c.execute('''
+            UPDATE cache
+            SET cached_at = ?,
+                etag = COALESCE(?, etag),
+                last_modified = COALESCE(?, last_modified)
+            WHERE url = ?
+        ''', (cached_at, etag, last_modified, url))
+
+        conn.commit()
+        conn.close()
+
+    async def store_parsed(self, url: str, content_hash: str, groups_json: str):
+        """Store parsed groups - the sweeper drops the ones no cached page uses any more"""
+        await asyncio.to_thread(self._store_parsed, content_hash, groups_json)
+
+    def _store_parsed(self, content_hash: str, groups_json: str):
+        conn = sqlite3.connect(DB_NAME)
+        c = conn.cursor()
+
+        c.execute('''
+            INSERT OR REPLACE INTO parsed_cache (content_hash, groups_json)
+            VALUES (?, ?)
+        ''', (content_hash, groups_json))
+
+        conn.commit()
+        conn.close()
+
+    async def delete(self, urls: List[str]) -> int:
+        return await asyncio.to_thread(self._delete, urls)
+
+    def _delete(self, urls: List[str]) -> int:
+        conn = sqlite3.connect(DB_NAME)
+        c = conn.cursor()
+        c.executemany('DELETE FROM cache WHERE url = ?', [(url,) for url in urls])
+        removed = conn.total_changes
+        conn.commit()
+        conn.close()
+        return removed
+
+    async def clear(self):
+        await asyncio.to_thread(self._clear)
+
+    def _clear(self):
+        conn = sqlite3.connect(DB_NAME)
+        c = conn.cursor()
+        c.execute('DELETE FROM cache')
+        c.execute('DELETE FROM parsed_cache')
+        conn.commit()
+        conn.close()
+
+    async def expire(self, cached_at: datetime) -> int:
+        return await asyncio.to_thread(self._expire, cached_at)
+
+    def _expire(self, cached_at: datetime) -> int:
+        conn = sqlite3.connect(DB_NAME)
+        c = conn.cursor()
+        c.execute('UPDATE cache SET cached_at = ? WHERE cached_at > ?', (cached_at, cached_at))
+        expired = c.rowcount
+        conn.commit()
+        conn.close()
+        return expired
+
+    async def sweep(self, max_bytes: int, max_age_seconds: int) -> Tuple[List[str], List[str]]:
+        accessed, self._accessed = self._accessed, {}
+        return await asyncio.to_thread(self._sweep, accessed, max_bytes, max_age_seconds)
+
+    def _sweep(self, accessed: Dict[str, datetime], max_bytes: int,
+               max_age_seconds: int) -> Tuple[List[str], List[str]]:
+        conn = sqlite3.connect(DB_NAME)
+        c = conn.cursor()
+
+        # Record the reads buffered since the last sweep before evicting by them
+        c.executemany('UPDATE cache SET accessed_at = ? WHERE url = ?', [
+            (accessed_at, url) for url, accessed_at in accessed.items()
+        ])
+
+        # Compress rows cached before content was stored compressed
+        c.execute("SELECT url, content FROM cache WHERE typeof(content) = 'text'")
+        for url, content in c.fetchall():
+            data = compress_content(content)
+            c.execute(
+                'UPDATE cache SET content = ?, size = ?, raw_size = ? WHERE url = ?',
+                (data, len(data), len(content.encode()), url)
+            )
+
+        c.execute('SELECT url FROM cache WHERE cached_at < ?', (datetime.now() - timedelta(seconds=max_age_seconds),))
+        expired = [row[0] for row in c.fetchall()]
+        c.executemany('DELETE FROM cache WHERE url = ?', [(url,) for url in expired])
+
+        # Keep the most recently read entries that fit the budget, counting their parsed groups too
+        c.execute('''
+            SELECT c.url, COALESCE(c.size, 0) + COALESCE(length(CAST(p.groups_json AS BLOB)), 0)
+            FROM cache c
+            LEFT JOIN parsed_cache p ON p.content_hash = c.content_hash
+            ORDER BY COALESCE(c.accessed_at, c.cached_at) DESC
+        ''')
+        evicted = []
+        total = 0
+        for url, size in c.fetchall():
+            total += size
+            if total > max_bytes:
+                evicted.append(url)
+        c.executemany('DELETE FROM cache WHERE url = ?', [(url,) for url in evicted])
+
+        # Parsed groups no cached page uses any more - dropped, replaced or changed pages
+        c.execute('''
+            DELETE FROM parsed_cache
+            WHERE content_hash NOT IN (SELECT content_hash FROM cache WHERE content_hash IS NOT NULL)
+        ''')
+
+        conn.commit()
+        conn.close()
+        return expired, evicted
+
+    async def stats(self) -> Dict[str, int]:
+        return await asyncio.to_thread(self._stats)
+
+    def _stats(self) -> Dict[str, int]:
+        conn = sqlite3.connect(DB_NAME)
+        c = conn.cursor()
+        c.execute('SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(raw_size), 0) FROM cache')
+        entries, size, raw_size = c.fetchone()
+        c.execute('SELECT COUNT(*), COALESCE(SUM(length(CAST(groups_json AS BLOB))), 0) FROM parsed_cache')
+        parsed_entries, parsed_bytes = c.fetchone()
+        conn.close()
+        return {
+            "entries": entries,
+            "bytes": size + parsed_bytes,
+            "contentBytes": size,
+            "rawContentBytes": raw_size,
+            "parsedEntries": parsed_entries,
+            "parsedBytes": parsed_bytes
+        }
+
+
+class MemoryCacheBackend(CacheBackend):
+    """
+    Process-local storage, for development and single-process setups -
+    lost on restart and not shared between workers
+    """
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = CACHE_MEMORY_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES):
+        # url -> (compressed content, record, raw size); content hash -> groups_json.
+        # The LRUs enforce the byte budget themselves, split between the two.
+        self._entries = MemoryLRU(max_entries, max_bytes * 3 // 4, ENTRY_TTL_SECONDS)
+        self._parsed = MemoryLRU(max_entries, max_bytes // 4, ENTRY_TTL_SECONDS)
+
+    async def get_entry(self, url: str) -> Optional[Dict]:
+        stored = self._entries.get(url)
+        if stored is None:
+            return None
+        record = dict(stored[1])
+        record['groups_json'] = self._parsed.get(record['content_hash'])
+        return record
+
+    async def get_content(self, url: str) -> Optional[str]:
+        stored = self._entries.get(url)
+        return decompress_content(stored[0]) if stored else None
+
+    async def store(self, url: str, content: str, record: Dict):
+        self._set(url, compress_content(content), record, len(content.encode()))
+
+    def _set(self, url: str, data: bytes, record: Dict, raw_size: int):
+        record = {key: record[key] for key in ('cached_at', 'etag', 'last_modified', 'content_hash')}
+        self._entries.set(url, (data, record, raw_size), len(url) + len(data) + 256)
+
+    async def touch(self, url: str, cached_at: datetime, etag: Optional[str], last_modified: Optional[str]):
+        stored = self._entries.get(url)
+        if stored is None:
+            return
+        data, record, raw_size = stored
+        self._set(url, data, dict(
+            record,
+            cached_at=cached_at,
+            etag=etag or record['etag'],
+            last_modified=last_modified or record['last_modified']
+        ), raw_size)
+
+    async def store_parsed(self, url: str, content_hash: str, groups_json: str):
+        self._parsed.set(content_hash, groups_json, len(groups_json) + 64)
+
+    async def delete(self, urls: List[str]) -> int:
+        return sum(1 for url in urls if self._entries.delete(url))
+
+    async def clear(self):
+        self._entries.clear()
+        self._parsed.clear()
+
+    async def expire(self, cached_at: datetime) -> int:
+        expired = 0
+        for url, (data, record, raw_size) in list(self._entries.items()):
+            if record['cached_at'] > cached_at:
+                self._set(url, data, dict(record, cached_at=cached_at), raw_size)
+                expired += 1
+        return expired
+
+    async def sweep(self, max_bytes: int, max_age_seconds: int) -> Tuple[List[str], List[str]]:
+        """Expire old entries - the LRUs already evict past the budget on every write"""
+        self._parsed.expire()
+        return self._entries.expire(), []
+
+    async def stats(self) -> Dict[str, int]:
+        entries = self._entries.stats()
+        parsed = self._parsed.stats()
+        return {
+            "entries": entries['entries'],
+            "bytes": entries['bytes'] + parsed['bytes'],
+            "contentBytes": entries['bytes'],
+            "rawContentBytes": sum(raw_size for _, (_, _, raw_size) in self._entries.items()),
+            "parsedEntries": parsed['entries'],
+            "parsedBytes": parsed['bytes'],
+            "evictions": entries['evictions'] + parsed['evictions']
+        }
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Redis storage shared by every API worker and replica, through the
+    asyncio client so a slow Redis never blocks the event loop. Each entry
+    is one hash holding the compressed content, validators and parsed
+    groups, so a read is a single HMGET; entries expire through Redis TTLs.
+
+    Redis errors are logged and treated as misses, and Redis is then left
+    alone for REDIS_RETRY_SECONDS, so an outage only costs upstream fetches
+    instead of a timeout on every request.
+    """
+
+    name = "redis"
+    FIELDS = ('cached_at', 'etag', 'last_modified', 'content_hash', 'groups_json', 'groups_hash')
+
+    def __init__(self, client=None, prefix: str = REDIS_KEY_PREFIX, ttl: int = ENTRY_TTL_SECONDS):
+        if client is None:
+            if redis is None:
+                raise RuntimeError("CACHE_BACKEND is 'redis' but the redis package is not installed")
+            # Binary responses: content is stored compressed, text fields are decoded here
+            client = redis_asyncio.Redis(
+                host=REDIS_HOST,
+                port=REDIS_PORT,
+                db=REDIS_DB,
+                password=REDIS_PASSWORD or None,
+                socket_timeout=REDIS_TIMEOUT_SECONDS,
+                socket_connect_timeout=REDIS_TIMEOUT_SECONDS
+            )
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self._retry_at = 0.0
+
+    def _entry_key(self, url: str) -> str:
+        return f"{self.prefix}entry:{url}"
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self._retry_at
+
+    def _failed(self, operation: str, error: Exception):
+        if self.available:
+            logger.warning(f"Redis cache {operation} failed, bypassing Redis for {REDIS_RETRY_SECONDS}s: {error}")
+        self._retry_at = time.monotonic() + REDIS_RETRY_SECONDS
+
+    @staticmethod
+    def _text(value) -> Optional[str]:
+        if isinstance(value, bytes):
+            value = value.decode()
+        return value or None
+
+    async def get_entry(self, url: str) -> Optional[Dict]:
+        if not self.available:
+            return None
+        try:
+            values = await self.client.hmget(self._entry_key(url), self.FIELDS)
+        except redis.RedisError as e:
+            self._failed("read", e)
+            return None
+
+        cached_at, etag, last_modified, content_hash, groups_json, groups_hash = (
+            self._text(value) for value in values
+        )
+        # A hash without content_hash is a write that raced a delete
+        if not cached_at or not content_hash:
+            return None
+
+        return {
+            "cached_at": datetime.fromisoformat(cached_at),
+            "etag": etag,
+            "last_modified": last_modified,
+            "content_hash": content_hash,
+            # Groups parsed from an earlier version of the content do not count
+            "groups_json": groups_json if groups_hash == content_hash else None
+        }
+
+    async def get_content(self, url: str) -> Optional[str]:
+        if not self.available:
+            return None
+        try:
+            data = await self.client.hget(self._entry_key(url), 'content')
+        except redis.RedisError as e:
+            self._failed("read", e)
+            return None
+        return decompress_content(data) if data is not None else None
+
+    async def store(self, url: str, content: str, record: Dict):
+        if not self.available:
+            return
+        key = self._entry_key(url)
+        data = compress_content(content)
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.delete(key)
+            pipe.hset(key, mapping={
+                'content': data,
+                'size': len(data),
+                'raw_size': len(content.encode()),
+                'cached_at': record['cached_at'].isoformat(),
+                'etag': record['etag'] or '',
+                'last_modified': record['last_modified'] or '',
+                'content_hash': record['content_hash']
+            })
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+        except redis.RedisError as e:
+            self._failed("write", e)
+
+    async def _update(self, url: str, fields: Dict, renew: bool):
+        """
+        Set fields of an entry in one round trip, renewing its TTL or only
+        giving it one if it has none (it was deleted meanwhile), so it cannot linger
+        """
+        if not self.available:
+            return
+        key = self._entry_key(url)
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            pipe.hset(key, mapping=fields)
+            pipe.expire(key, self.ttl, nx=not renew)
+            await pipe.execute()
+        except redis.RedisError as e:
+            self._failed("write", e)
+
+    async def touch(self, url: str, cached_at: datetime, etag: Optional[str], last_modified: Optional[str]):
+        fields = {'cached_at': cached_at.isoformat()}
+        if etag:
+            fields['etag'] = etag
+        if last_modified:
+            fields['last_modified'] = last_modified
+        await self._update(url, fields, renew=True)
+
+    async def store_parsed(self, url: str, content_hash: str, groups_json: str):
+        await self._update(url, {'groups_json': groups_json, 'groups_hash': content_hash}, renew=False)
+
+    async def delete(self, urls: List[str]) -> int:
+        if not urls or not self.available:
+            return 0
+        try:
+            return await self.client.delete(*(self._entry_key(url) for url in urls))
+        except redis.RedisError as e:
+            self._failed("delete", e)
+            return 0
+
+    async def clear(self):
+        """Delete this cache's keys only - the Redis database may be shared"""
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            async for key in self.client.scan_iter(match=f"{self.prefix}*", count=500):
+                pipe.delete(key)
+            await pipe.execute()
+        except redis.RedisError as e:
+            self._failed("clear", e)
+
+    async def expire(self, cached_at: datetime) -> int:
+        if not self.available:
+            return 0
+        try:
+            urls = [url for url, entry_cached_at, _, _, _ in await self._sizes()
+                    if datetime.fromisoformat(entry_cached_at) > cached_at]
+            pipe = self.client.pipeline(transaction=False)
+            for url in urls:
+                # A TTL only if the entry was deleted meanwhile, as in _update
+                pipe.hset(self._entry_key(url), 'cached_at', cached_at.isoformat())
+                pipe.expire(self._entry_key(url), self.ttl, nx=True)
+            await pipe.execute()
+        except redis.RedisError as e:
+            self._failed("expire", e)
+            return 0
+        return len(urls)
+
+    async def _sizes(self) -> List[Tuple[str, str, int, int, int]]:
+        """(url, cached_at, content size, raw size, parsed groups size) per entry"""
+        entry_prefix = self._entry_key('')
+        keys = [key async for key in self.client.scan_iter(match=f"{entry_prefix}*", count=500)]
+
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipe.hmget(key, ('cached_at', 'size', 'raw_size'))
+            pipe.hstrlen(key, 'groups_json')
+        results = await pipe.execute()
+
+        entries = []
+        for key, (cached_at, size, raw_size), parsed_size in zip(keys, results[::2], results[1::2]):
+            if cached_at is None:
+                continue
+            url = self._text(key)[len(entry_prefix):]
+            entries.append((url, self._text(cached_at), int(size or 0), int(raw_size or 0), parsed_size))
+        return entries
+
+    async def sweep(self, max_bytes: int, max_age_seconds: int) -> Tuple[List[str], List[str]]:
+        """
+        Enforce the byte budget, evicting the oldest entries first - Redis
+        TTLs already expire entries by age, and reads leave no access time
+        """
+        if not self.available:
+            return [], []
+        try:
+            entries = await self._sizes()
+        except redis.RedisError as e:
+            self._failed("sweep", e)
+            return [], []
+
+        total = sum(size + parsed_size for _, _, size, _, parsed_size in entries)
+        evicted = []
+        for url, _, size, _, parsed_size in sorted(entries, key=lambda entry: entry[1]):
+            if total <= max_bytes:
+                break
+            evicted.append(url)
+            total -= size + parsed_size
+        await self.delete(evicted)
+        return [], evicted
+
+    async def stats(self) -> Dict[str, int]:
+        if not self.available:
+            return {}
+        try:
+            entries = await self._sizes()
+        except redis.RedisError as e:
+            self._failed("stats", e)
+            return {}
+        size = sum(entry[2] for entry in entries)
+        parsed_size = sum(entry[4] for entry in entries)
+        return {
+            "entries": len(entries),
+            "bytes": size + parsed_size,
+            "contentBytes": size,
+            "rawContentBytes": sum(entry[3] for entry in entries),
+            "parsedEntries": sum(1 for entry in entries if entry[4]),
+            "parsedBytes": parsed_size
+        }
+
+
+def create_cache_backend(name: str) -> CacheBackend:
+    """Cache backend for a CACHE_BACKEND setting"""
+    backends = {
+        "sqlite": SQLiteCacheBackend,
+        "memory": MemoryCacheBackend,
+        "redis": RedisCacheBackend,
+    }
+    if name not in backends:
+        raise ValueError(f"Unknown CACHE_BACKEND {name!r}, expected one of {', '.join(backends)}")
+    return backends[name]()
@@ -0,0 +1,61 @@
+"""
+Targeted wiki cache invalidation - by user, wiki URL or GitLab project
+"""
+import urllib.parse
+from fastapi import HTTPException
+from typing import Dict, List, Optional
+from database import get_all_users, get_user_by_username
+from cache import invalidate_cache
+from wiki import split_wiki_url, extract_api_url_from_wiki_url, extract_project_wikis_url
+
+
+def wiki_location(wiki_url: str) -> Optional[tuple]:
+    """(project path, page slug) of a wiki page URL, lowercased for matching"""
+    try:
+        _, project_path_encoded, slug = split_wiki_url(wiki_url)
+    except HTTPException:
+        return None
+    return urllib.parse.unquote(project_path_encoded).lower(), urllib.parse.unquote(slug).lower()
+
+
+def affected_users(project_path: str, slug: Optional[str] = None) -> List[dict]:
+    """Users whose wiki is in the project, flagged when it is the given page"""
+    affected = []
+    for user in get_all_users():
+        location = wiki_location(user['wiki_url'])
+        if location and location[0] == project_path:
+            affected.append(dict(user, page_changed=location[1] == slug))
+    return affected
+
+
+def wiki_cache_urls(wiki_url: str) -> List[str]:
+    """Cache keys holding a wiki page: the page itself and its project's page list"""
+    return [extract_api_url_from_wiki_url(wiki_url), extract_project_wikis_url(wiki_url)]
+
+
+async def _invalidate(urls) -> Dict:
+    urls = sorted(set(urls))
+    return {"invalidated": urls, "removed": await invalidate_cache(urls)}
+
+
+async def invalidate_wiki_url(wiki_url: str) -> Dict:
+    """Drop one wiki page from the cache"""
+    return await _invalidate(wiki_cache_urls(wiki_url))
+
+
+async def invalidate_user(username: str) -> Optional[Dict]:
+    """Drop a user's wiki from the cache; None if there is no such user"""
+    user = get_user_by_username(username)
+    if not user:
+        return None
+    if not user[1]:
+        return await _invalidate([])
+    return await invalidate_wiki_url(user[1])
+
+
+async def invalidate_project(project_path: str) -> Dict:
+    """Drop every cached page of a GitLab project (path with namespace) that users have as their wiki"""
+    project_path = project_path.strip('/').lower()
+    users = affected_users(project_path)
+    urls = [url for user in users for url in wiki_cache_urls(user['wiki_url'])]
+    return dict(await _invalidate(urls), users=[user['username'] for user in users])
@@ -0,0 +1,76 @@
+"""
+Background sweeper keeping the wiki cache within its age and size limits
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+from config import CACHE_SWEEP_INTERVAL_SECONDS
+from cache import sweep_cache
+
+logger = logging.getLogger(__name__)
+
+
+class CacheSweeper:
+    """Runs sweep_cache every interval seconds on the event loop"""
+
+    def __init__(self, interval: int = CACHE_SWEEP_INTERVAL_SECONDS):
+        self.interval = interval
+        self.last_sweep_at: Optional[datetime] = None
+        self.last_result: Dict[str, int] = {}
+        self.expired = 0
+        self.evicted = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start the sweep loop on the running event loop"""
+        if self.running:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the sweep loop and wait for it to exit"""
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def sweep(self) -> Dict[str, int]:
+        """Sweep once"""
+        result = await sweep_cache()
+        self.last_sweep_at = datetime.now()
+        self.last_result = result
+        self.expired += result['expired']
+        self.evicted += result['evicted']
+        if result['expired'] or result['evicted']:
+            logger.info(f"Wiki cache sweep: {result['expired']} expired, {result['evicted']} evicted")
+        return result
+
+    async def _run(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Wiki cache sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> Dict:
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "lastSweepAt": self.last_sweep_at.isoformat() if self.last_sweep_at else None,
+            "lastSweep": self.last_result,
+            "expired": self.expired,
+            "evicted": self.evicted
+        }
+
+
+sweeper = CacheSweeper()
@@ -0,0 +1,101 @@
+"""
+Wiki cache warming - loading users' wikis in the background, a few at a time
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List
+from config import CACHE_WARMUP_CONCURRENCY, CACHE_WARMUP_ACTIVE_HOURS, CACHE_WARMUP_MAX_USERS
+from database import get_user_session, get_recently_active_users
+from cache import get_cache_entry
+from wiki import load_wiki, refresh_wiki, extract_api_url_from_wiki_url
+
+logger = logging.getLogger(__name__)
+
+_warm_tasks = set()
+
+
+async def warm_wikis(users: List[dict], concurrency: int = CACHE_WARMUP_CONCURRENCY,
+                     pause: float = 0, revalidate: bool = False) -> Dict[str, int]:
+    """
+    Load the users' wikis through the cache, concurrency at a time and
+    pausing between loads; returns how many were warmed and how many failed.
+    Users sharing a wiki page load it once. With revalidate, cached wikis are
+    refreshed upstream with conditional requests instead of served from the cache.
+    """
+    pages = {}
+    for user in users:
+        if user.get('wiki_url'):
+            try:
+                pages.setdefault(extract_api_url_from_wiki_url(user['wiki_url']), user['username'])
+            except Exception as e:
+                logger.debug(f"Skipping cache warm-up for {user['username']}: {getattr(e, 'detail', e)}")
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def warm(api_url: str, username: str) -> bool:
+        async with semaphore:
+            try:
+                if revalidate:
+                    await refresh_wiki(api_url, get_user_session(username), await get_cache_entry(api_url))
+                else:
+                    await load_wiki(api_url, get_user_session(username))
+                return True
+            except Exception as e:
+                logger.debug(f"Warming the wiki of {username} failed: {getattr(e, 'detail', e)}")
+                return False
+            finally:
+                if pause:
+                    await asyncio.sleep(pause)
+
+    results = await asyncio.gather(*(warm(api_url, username) for api_url, username in pages.items()))
+    warmed = sum(results)
+    return {"warmed": warmed, "failed": len(results) - warmed}
+
+
+def _warm_done(task: asyncio.Task):
+    _warm_tasks.discard(task)
+    if task.cancelled():
+        return
+    if task.exception():
+        logger.warning(f"Wiki cache warm-up failed: {task.exception()}")
+        return
+    result = task.result()
+    # A single wiki is a login warm-up - not worth an info line each
+    log = logger.info if result['warmed'] + result['failed'] > 1 else logger.debug
+    log(f"Wiki cache warm-up: {result['warmed']} wikis loaded, {result['failed']} failed")
+
+
+def schedule_warmup(users: List[dict], concurrency: int = CACHE_WARMUP_CONCURRENCY,
+                    pause: float = 0, revalidate: bool = False) -> asyncio.Task:
+    """Warm the users' wikis in the background"""
+    task = asyncio.ensure_future(warm_wikis(users, concurrency, pause, revalidate))
+    _warm_tasks.add(task)
+    task.add_done_callback(_warm_done)
+    return task
+
+
+def warm_user_wiki(username: str, wiki_url: str):
+    """Start loading a user's wiki in the background, so their first dashboard view is a cache hit"""
+    if wiki_url:
+        schedule_warmup([{"username": username, "wiki_url": wiki_url}], concurrency=1)
+
+
+def warm_recently_active() -> int:
+    """
+    Warm the wikis of users who logged in recently, most recent first;
+    returns how many users are being warmed
+    """
+    since = datetime.now() - timedelta(hours=CACHE_WARMUP_ACTIVE_HOURS)
+    users = get_recently_active_users(since, CACHE_WARMUP_MAX_USERS)
+    if users:
+        schedule_warmup(users)
+    return len(users)
+
+
+async def stop_warmups():
+    """Cancel warm-ups still running, e.g. at shutdown"""
+    tasks = list(_warm_tasks)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
@@ -1,6 +1,7 @@
 """
 Application configuration and initialization
 """
+import os
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer
@@ -32,3 +33,95 @@ MINT_URL = "http://mint.systemhaus.com.br:9070"
 DB_NAME = 'portal.db'
 SESSION_EXPIRY_HOURS = 8
 CACHE_EXPIRY_MINUTES = 15
+# Past expiry, serve the stale wiki and refresh it in the background for this long
+CACHE_STALE_GRACE_MINUTES = 60
+# Never serve wiki data older than this, even when Mint is failing
+CACHE_MAX_STALENESS_MINUTES = 24 * 60
+# Wiki cache storage: "sqlite" (default), "memory" (per process) or "redis" (shared by workers)
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "sqlite")
+REDIS_HOST = os.environ.get("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.environ.get("REDIS_PORT", "6379"))
+REDIS_DB = int(os.environ.get("REDIS_DB", "0"))
+REDIS_PASSWORD = os.environ.get("REDIS_PASSWORD", "")
+REDIS_KEY_PREFIX = "synks:wiki:"
+REDIS_TIMEOUT_SECONDS = 2
+REDIS_RETRY_SECONDS = 10  # after a Redis error, serve wikis without the cache this long before retrying
+# Raw wiki content is stored zlib-compressed
+CACHE_COMPRESSION_LEVEL = 6
+# Stored size budget for the wiki cache; the sweeper evicts least recently used entries past it
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+CACHE_SWEEP_INTERVAL_SECONDS = 300
+
+# In-process tier in front of the wiki cache backend
+CACHE_MEMORY_MAX_ENTRIES = 1000
+CACHE_MEMORY_MAX_BYTES = 64 * 1024 * 1024
+CACHE_MEMORY_TTL_SECONDS = 60  # bounds how long other processes' writes go unseen
+
+# Background wiki cache warming: wikis loaded at once, and after a full flush
+# a slower re-warm with a pause between loads so Mint is not hit all at once
+CACHE_WARMUP_CONCURRENCY = 4
+CACHE_REWARM_CONCURRENCY = 2
+CACHE_REWARM_PAUSE_SECONDS = 0.5
+# At startup, warm the wikis of users who logged in within this window, most recent first
+CACHE_WARMUP_ACTIVE_HOURS = 72
+CACHE_WARMUP_MAX_USERS = 200
+
+# Secret GitLab sends as X-Gitlab-Token with wiki page webhooks (empty = webhook disabled)
+GITLAB_WEBHOOK_SECRET = os.environ.get("GITLAB_WEBHOOK_SECRET", "")
+
+# Link catalog wiki collection
+WIKI_FETCH_CONCURRENCY = 16
+WIKI_FETCH_TIMEOUT_SECONDS = 20
+
+# Shared HTTP client for Mint/GitLab
+MINT_HTTP_TIMEOUT_SECONDS = 30
+MINT_HTTP_MAX_CONNECTIONS = 50
+MINT_HTTP_MAX_KEEPALIVE = 20
+MINT_HTTP_KEEPALIVE_SECONDS = 60
+MINT_HTTP2 = True  # only used when the h2 package is installed
+
+# Status probes
+PROBE_TIMEOUT_SECONDS = 2
+PROBE_MAX_CONCURRENCY = 1000  # keep below the process open-file limit (ulimit -n)
+PROBE_MAX_PER_HOST = 8  # stay well under customer SYN-flood protection
+PROBE_SCHEDULE_JITTER = 0.1  # +/- fraction applied to each target's next check time
+PROBE_INTERVAL_SECONDS = 60  # base interval, also how often the link catalog is re-read
+PROBE_MIN_INTERVAL_SECONDS = 15  # re-check interval right after a state change
+PROBE_MAX_INTERVAL_SECONDS = 600  # ceiling for long-stable online targets
+PROBE_BACKOFF_FACTOR = 2
+PROBE_TICK_SECONDS = 5
+PROBE_OFFLINE_CONFIRM_RETRIES = 2
+PROBE_OFFLINE_CONFIRM_DELAY_SECONDS = 1
+PROBE_MODE = "tcp"  # default for links without a probe setting: "tcp" or "http"
+
+# Who probes: "embedded" - this process probes everything,
+# "sharded" - this process probes the shards it holds leases for (like probe_worker.py),
+# "external" - only probe_worker.py processes probe; the API serves their results
+PROBE_SCHEDULER_MODE = os.environ.get("PROBE_SCHEDULER_MODE", "embedded")
+PROBE_SHARDS = 64
+PROBE_LEASE_TTL_SECONDS = 30
+DB_LOCK_TIMEOUT_SECONDS = 30  # how long a writer waits on another process's transaction
+
+# HTTP probe mode
+HTTP_PROBE_METHOD = "HEAD"
+HTTP_PROBE_EXPECTED_STATUS = "200-399"
+HTTP_PROBE_MAX_CONNECTIONS = 500
+HTTP_PROBE_MAX_KEEPALIVE = 200
+HTTP_PROBE_KEEPALIVE_SECONDS = 120
+HTTP_PROBE_VERIFY_TLS = True
+
+# Probe history
+PROBE_RAW_RETENTION_HOURS = 48
+# Buckets are only rolled up once this old, so samples other workers are still
+# flushing (a tick plus up to DB_LOCK_TIMEOUT_SECONDS behind) land before the watermark moves
+PROBE_ROLLUP_SETTLE_SECONDS = 120
+PROBE_MINUTE_ROLLUP_RETENTION_DAYS = 7
+PROBE_HOUR_ROLLUP_RETENTION_DAYS = 90
+PROBE_UPTIME_WINDOW_DAYS = 30
+
+# DNS cache for status probes
+DNS_CACHE_TTL_SECONDS = 300
+DNS_NEGATIVE_TTL_SECONDS = 60
+DNS_CACHE_MAX_ENTRIES = 10000
+# Resolver threads of their own, so lookups never queue behind other to_thread work
+DNS_RESOLVER_THREADS = 64
@@ -4,7 +4,7 @@ Database initialization and operations
 import sqlite3
 import hashlib
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import Dict, List, Optional
 from config import DB_NAME, SESSION_EXPIRY_HOURS
 import secrets
 
@@ -14,6 +14,9 @@ def init_db():
     conn = sqlite3.connect(DB_NAME)
     c = conn.cursor()
 
+    # WAL lets the probe history writer and request handlers work concurrently
+    c.execute('PRAGMA journal_mode=WAL')
+
     # Users table with wiki_url
     c.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -40,7 +43,128 @@ def init_db():
         CREATE TABLE IF NOT EXISTS cache (
             url TEXT PRIMARY KEY,
             content TEXT,
-            cached_at TIMESTAMP
+            cached_at TIMESTAMP,
+            etag TEXT,
+            last_modified TEXT,
+            content_hash TEXT,
+            size INTEGER,
+            raw_size INTEGER,
+            accessed_at TIMESTAMP
+        )
+    ''')
+
+    # Validators for conditional revalidation, added to existing cache tables
+    c.execute('PRAGMA table_info(cache)')
+    cache_columns = {row[1] for row in c.fetchall()}
+    for column in ('etag', 'last_modified', 'content_hash'):
+        if column not in cache_columns:
+            c.execute(f'ALTER TABLE cache ADD COLUMN {column} TEXT')
+
+    # Size accounting and last read time for the cache sweeper. content holds
+    # zlib-compressed bytes; rows from before compression keep their text
+    # until the sweeper compresses them.
+    for column, column_type in (('size', 'INTEGER'), ('raw_size', 'INTEGER'), ('accessed_at', 'TIMESTAMP')):
+        if column not in cache_columns:
+            c.execute(f'ALTER TABLE cache ADD COLUMN {column} {column_type}')
+
+    # Parsed and serialized dashboard groups, keyed by wiki content hash
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS parsed_cache (
+            content_hash TEXT PRIMARY KEY,
+            groups_json TEXT NOT NULL
+        )
+    ''')
+
+    # Per-link probe overrides (HTTP mode, expected status, body match)
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS probe_settings (
+            url TEXT PRIMARY KEY,
+            mode TEXT NOT NULL,
+            method TEXT,
+            expected_status TEXT,
+            body_match TEXT
+        )
+    ''')
+
+    # Raw probe samples - append only, time-ordered, pruned after rollup
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS probe_history (
+            target TEXT NOT NULL,
+            checked_at INTEGER NOT NULL,
+            online INTEGER NOT NULL,
+            response_time INTEGER,
+            interval_seconds INTEGER
+        )
+    ''')
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_probe_history_checked_at
+        ON probe_history (checked_at)
+    ''')
+
+    # Per-target aggregates for 1 minute / 1 hour / 1 day buckets
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS probe_rollups (
+            target TEXT NOT NULL,
+            bucket_seconds INTEGER NOT NULL,
+            bucket_start INTEGER NOT NULL,
+            samples INTEGER NOT NULL,
+            online_samples INTEGER NOT NULL,
+            p50_response_time INTEGER,
+            p95_response_time INTEGER,
+            seconds INTEGER,
+            online_seconds INTEGER,
+            PRIMARY KEY (target, bucket_seconds, bucket_start)
+        ) WITHOUT ROWID
+    ''')
+
+    # Time each sample stands for, so uptime weighs samples by the interval they cover
+    c.execute('PRAGMA table_info(probe_history)')
+    if 'interval_seconds' not in {row[1] for row in c.fetchall()}:
+        c.execute('ALTER TABLE probe_history ADD COLUMN interval_seconds INTEGER')
+    c.execute('PRAGMA table_info(probe_rollups)')
+    rollup_columns = {row[1] for row in c.fetchall()}
+    for column in ('seconds', 'online_seconds'):
+        if column not in rollup_columns:
+            c.execute(f'ALTER TABLE probe_rollups ADD COLUMN {column} INTEGER')
+    c.execute('''
+        CREATE INDEX IF NOT EXISTS idx_probe_rollups_bucket
+        ON probe_rollups (bucket_seconds, bucket_start)
+    ''')
+
+    # Latest result per target, shared by all probe workers
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS probe_latest (
+            target TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            response_time INTEGER,
+            dns_time INTEGER,
+            method TEXT,
+            http_status INTEGER,
+            error TEXT,
+            checked_at TIMESTAMP
+        )
+    ''')
+
+    # Probe workers and the shards of the target set they hold leases on
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS probe_workers (
+            worker_id TEXT PRIMARY KEY,
+            heartbeat_at REAL NOT NULL
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS probe_leases (
+            shard INTEGER PRIMARY KEY,
+            owner TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    ''')
+
+    # How far each rollup level has been computed
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS probe_rollup_state (
+            bucket_seconds INTEGER PRIMARY KEY,
+            rolled_until INTEGER NOT NULL
         )
     ''')
 
@@ -259,6 +383,25 @@ def get_user_session(username: str) -> Optional[str]:
     return result[0] if result else None
 
 
+def get_recently_active_users(since: datetime, limit: int) -> List[dict]:
+    """Users with a session created since the given time, most recently active first"""
+    conn = sqlite3.connect(DB_NAME)
+    c = conn.cursor()
+    c.execute('''
+        SELECT u.username, u.wiki_url, MAX(s.created_at) AS last_login
+        FROM sessions s
+        JOIN users u ON s.username = u.username
+        WHERE s.created_at >= ?
+        GROUP BY u.username
+        ORDER BY last_login DESC
+        LIMIT ?
+    ''', (since, limit))
+    results = c.fetchall()
+    conn.close()
+
+    return [{"username": row[0], "wiki_url": row[1], "last_login": row[2]} for row in results]
+
+
 def get_user_by_username(username: str) -> Optional[tuple]:
     """Get user data by username"""
     conn = sqlite3.connect(DB_NAME)
@@ -267,3 +410,67 @@ def get_user_by_username(username: str) -> Optional[tuple]:
     result = c.fetchone()
     conn.close()
     return result
+
+
+def get_probe_settings() -> Dict[str, dict]:
+    """Get all per-link probe settings keyed by URL"""
+    conn = sqlite3.connect(DB_NAME)
+    c = conn.cursor()
+    c.execute('SELECT url, mode, method, expected_status, body_match FROM probe_settings')
+    results = c.fetchall()
+    conn.close()
+
+    return {
+        row[0]: {
+            "url": row[0],
+            "mode": row[1],
+            "method": row[2],
+            "expected_status": row[3],
+            "body_match": row[4]
+        }
+        for row in results
+    }
+
+
+def get_probe_setting(url: str) -> Optional[dict]:
+    """Get the probe settings for a single link URL"""
+    conn = sqlite3.connect(DB_NAME)
+    c = conn.cursor()
+    c.execute('SELECT url, mode, method, expected_status, body_match FROM probe_settings WHERE url = ?', (url,))
+    row = c.fetchone()
+    conn.close()
+
+    if not row:
+        return None
+
+    return {
+        "url": row[0],
+        "mode": row[1],
+        "method": row[2],
+        "expected_status": row[3],
+        "body_match": row[4]
+    }
+
+
+def set_probe_setting(url: str, mode: str, method: Optional[str] = None,
+                      expected_status: Optional[str] = None, body_match: Optional[str] = None):
+    """Create or replace the probe settings for a link URL"""
+    conn = sqlite3.connect(DB_NAME)
+    c = conn.cursor()
+    c.execute('''
+        INSERT OR REPLACE INTO probe_settings (url, mode, method, expected_status, body_match)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (url, mode, method, expected_status, body_match))
+    conn.commit()
+    conn.close()
+
+
+def delete_probe_setting(url: str) -> bool:
+    """Remove the probe settings for a link URL"""
+    conn = sqlite3.connect(DB_NAME)
+    c = conn.cursor()
+    c.execute('DELETE FROM probe_settings WHERE url = ?', (url,))
+    deleted = c.rowcount > 0
+    conn.commit()
+    conn.close()
+    return deleted
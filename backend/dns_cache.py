@@ -0,0 +1,101 @@
+"""
+Async DNS resolver cache for status probes
+"""
+import asyncio
+import socket
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+from config import DNS_CACHE_TTL_SECONDS, DNS_NEGATIVE_TTL_SECONDS, DNS_CACHE_MAX_ENTRIES, DNS_RESOLVER_THREADS
+from singleflight import SingleFlight
+
+# getaddrinfo errors that mean "this name does not exist" rather than "try again"
+_NEGATIVE_ERRORS = {
+    code for code in (
+        getattr(socket, 'EAI_NONAME', None),
+        getattr(socket, 'EAI_NODATA', None),
+    ) if code is not None
+}
+
+
+class DNSCache:
+    """
+    Caches getaddrinfo results per hostname with a TTL, remembers names
+    that do not exist for a shorter negative TTL, and coalesces concurrent
+    lookups of the same name into one resolver call.
+
+    getaddrinfo blocks, so lookups run on the cache's own thread pool
+    rather than the loop's default executor. Lookup timeouts start when a
+    resolver thread picks the lookup up, not while it waits in the queue.
+    """
+
+    def __init__(self, ttl: float = DNS_CACHE_TTL_SECONDS,
+                 negative_ttl: float = DNS_NEGATIVE_TTL_SECONDS,
+                 max_entries: int = DNS_CACHE_MAX_ENTRIES,
+                 threads: int = DNS_RESOLVER_THREADS):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="dns")
+        # hostname -> (expires_at, addrinfo list or gaierror)
+        self._entries: "OrderedDict[str, Tuple[float, object]]" = OrderedDict()
+        self._lookups = SingleFlight()
+
+    def _store(self, hostname: str, value, ttl: float):
+        self._entries[hostname] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(hostname)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _lookup_cached(self, hostname: str):
+        entry = self._entries.get(hostname)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if time.monotonic() > expires_at:
+            del self._entries[hostname]
+            return None
+        return value
+
+    async def _resolve(self, hostname: str, timeout: Optional[float]) -> List[tuple]:
+        loop = asyncio.get_running_loop()
+        started = asyncio.Event()
+
+        def lookup():
+            loop.call_soon_threadsafe(started.set)
+            return socket.getaddrinfo(hostname, 0, type=socket.SOCK_STREAM)
+
+        lookup_future = loop.run_in_executor(self._executor, lookup)
+        try:
+            await started.wait()
+            infos = await asyncio.wait_for(lookup_future, timeout)
+        except socket.gaierror as e:
+            if e.errno in _NEGATIVE_ERRORS:
+                self._store(hostname, e, self.negative_ttl)
+            raise
+        self._store(hostname, infos, self.ttl)
+        return infos
+
+    async def resolve(self, hostname: str, port: int, timeout: Optional[float] = None) -> List[tuple]:
+        """
+        Resolve hostname to getaddrinfo tuples with the given port filled in
+        Raises socket.gaierror for names that do not resolve and
+        asyncio.TimeoutError when the resolver takes longer than timeout
+        """
+        value = self._lookup_cached(hostname)
+        if value is None:
+            value = await self._lookups.do(hostname, lambda: self._resolve(hostname, timeout))
+        if isinstance(value, socket.gaierror):
+            raise value
+
+        return [
+            (family, sock_type, proto, canonname, (address[0], port) + tuple(address[2:]))
+            for family, sock_type, proto, canonname, address in value
+        ]
+
+    def clear(self):
+        self._entries.clear()
+
+
+dns_cache = DNSCache()
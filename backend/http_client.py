@@ -0,0 +1,110 @@
+"""
+Shared HTTP client for Mint/GitLab requests
+"""
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Optional
+import httpx
+from config import (
+    MINT_HTTP_TIMEOUT_SECONDS,
+    MINT_HTTP_MAX_CONNECTIONS,
+    MINT_HTTP_MAX_KEEPALIVE,
+    MINT_HTTP_KEEPALIVE_SECONDS,
+    MINT_HTTP2,
+)
+
+# HTTP/2 needs the optional h2 package (httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class _RejectAllCookies(DefaultCookiePolicy):
+    """The shared client must never keep one user's cookies for the next request"""
+
+    def set_ok(self, cookie, request):
+        return False
+
+
+_transport: Optional[httpx.AsyncHTTPTransport] = None
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _create():
+    global _transport, _client
+    _transport = httpx.AsyncHTTPTransport(
+        http2=MINT_HTTP2 and HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=MINT_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=MINT_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=MINT_HTTP_KEEPALIVE_SECONDS
+        )
+    )
+    _client = httpx.AsyncClient(
+        transport=_transport,
+        follow_redirects=True,
+        timeout=MINT_HTTP_TIMEOUT_SECONDS,
+        cookies=CookieJar(policy=_RejectAllCookies())
+    )
+
+
+async def start_http_client():
+    """Create the application-wide client (called from app startup)"""
+    if _client is None:
+        _create()
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Shared, connection-pooled client
+    It stores no cookies - send session cookies per request with cookie_header()
+    """
+    if _client is None:
+        # Scripts and probe workers that never ran app startup
+        _create()
+    return _client
+
+
+def new_session_client() -> httpx.AsyncClient:
+    """
+    Client with its own cookie jar on top of the shared connection pool, for
+    multi-step flows like the Mint login. Do not close it (or use it in
+    `async with`): closing a client closes the pool it shares.
+    """
+    get_http_client()
+    return httpx.AsyncClient(
+        transport=_transport,
+        follow_redirects=True,
+        timeout=MINT_HTTP_TIMEOUT_SECONDS
+    )
+
+
+async def close_http_client():
+    """Close the pool (called from app shutdown)"""
+    global _transport, _client
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _transport = None
+
+
+def cookie_header(session_cookie: Optional[str]) -> Optional[str]:
+    """
+    Turn a stored Mint session into a Cookie header value
+    Accepts a full "k=v; k2=v2" cookie string or a bare _gitlab_session value
+    """
+    if not session_cookie:
+        return None
+
+    cookies_dict = {}
+    if ';' in session_cookie or '=' in session_cookie:
+        for cookie in session_cookie.split(';'):
+            cookie = cookie.strip()
+            if '=' in cookie:
+                key, value = cookie.split('=', 1)
+                cookies_dict[key.strip()] = value.strip()
+    else:
+        cookies_dict['_gitlab_session'] = session_cookie
+
+    return '; '.join(f"{key}={value}" for key, value in cookies_dict.items()) or None
@@ -0,0 +1,152 @@
+"""
+Link catalog - collects monitored links from users' GitLab wikis
+"""
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+from fastapi import HTTPException
+from config import WIKI_FETCH_CONCURRENCY, WIKI_FETCH_TIMEOUT_SECONDS
+from database import get_all_users, get_user_session, get_user_by_username, get_probe_settings
+from wiki import ProjectWikis, fetch_and_parse_wiki, extract_project_wikis_url, load_project_wikis
+from simple_status_check import get_link_target, get_probe_spec
+
+logger = logging.getLogger(__name__)
+
+
+def build_link_entry(username: str, group, link, probe_settings: dict) -> dict:
+    """Catalog entry for one wiki link, including how and what to probe"""
+    spec = get_probe_spec(link.url, probe_settings.get(link.url))
+    return {
+        'id': f"{username}_{link.url}",
+        'name': link.text,
+        'url': link.url,
+        'probe': spec,
+        'target': get_link_target(link.url, spec),
+        'username': username,
+        'product': group.product,
+        'environment': group.environment
+    }
+
+
+def describe_failure(error: BaseException) -> str:
+    """Readable reason a user's wiki could not be collected"""
+    if isinstance(error, asyncio.TimeoutError):
+        return f"Timed out after {WIKI_FETCH_TIMEOUT_SECONDS}s"
+    if isinstance(error, HTTPException):
+        return str(error.detail)
+    return str(error) or type(error).__name__
+
+
+def group_users_by_project(users: List[dict]) -> Dict[Optional[str], List[dict]]:
+    """Users keyed by their wiki's project list URL (None for unusable wiki URLs)"""
+    projects: Dict[Optional[str], List[dict]] = {}
+    for user in users:
+        try:
+            wikis_url = extract_project_wikis_url(user['wiki_url'])
+        except HTTPException:
+            wikis_url = None
+        projects.setdefault(wikis_url, []).append(user)
+    return projects
+
+
+async def collect_all_links() -> Tuple[List[dict], List[dict]]:
+    """
+    Collect links from all users' GitLab wikis, at most
+    WIKI_FETCH_CONCURRENCY fetches at a time and each with its own timeout.
+
+    Users are grouped by GitLab project: each project's pages come from one
+    list request and are shared by its users. A user whose page is not in
+    the list, or whose project list fails, falls back to a page fetch.
+    Returns (links, failures), one failure entry per user that failed.
+    """
+    users = get_all_users()
+    probe_settings = get_probe_settings()
+    semaphore = asyncio.Semaphore(WIKI_FETCH_CONCURRENCY)
+    sessions = {user['username']: get_user_session(user['username']) for user in users}
+
+    async def fetch(awaitable):
+        async with semaphore:
+            # Goes through the wiki cache; a timed out fetch still finishes and fills it
+            return await asyncio.wait_for(awaitable, WIKI_FETCH_TIMEOUT_SECONDS)
+
+    def entries(username: str, groups) -> List[dict]:
+        return [
+            build_link_entry(username, group, link, probe_settings)
+            for group in groups
+            for link in group.links
+        ]
+
+    async def collect_user(user: dict, project: Optional[ProjectWikis]) -> List[dict]:
+        groups = project.groups(user['wiki_url']) if project else None
+        if groups is None:
+            groups = await fetch(fetch_and_parse_wiki(user['wiki_url'], sessions[user['username']]))
+        return entries(user['username'], groups)
+
+    async def collect_project(wikis_url: Optional[str], project_users: List[dict]) -> list:
+        project = None
+        if wikis_url:
+            session = next((sessions[user['username']] for user in project_users if sessions[user['username']]), None)
+            try:
+                project = await fetch(load_project_wikis(wikis_url, session))
+            except Exception as e:
+                logger.info(f"Wiki list {wikis_url} unavailable, fetching pages one by one: {describe_failure(e)}")
+
+        return await asyncio.gather(
+            *(collect_user(user, project) for user in project_users),
+            return_exceptions=True
+        )
+
+    projects = group_users_by_project(users)
+    project_results = await asyncio.gather(
+        *(collect_project(wikis_url, project_users) for wikis_url, project_users in projects.items())
+    )
+
+    all_links = []
+    failures = []
+    for project_users, results in zip(projects.values(), project_results):
+        for user, result in zip(project_users, results):
+            if isinstance(result, BaseException):
+                failures.append({
+                    'username': user['username'],
+                    'wikiUrl': user['wiki_url'],
+                    'error': describe_failure(result)
+                })
+            else:
+                all_links.extend(result)
+
+    return all_links, failures
+
+
+async def get_all_links_from_gitlab_wikis() -> List[dict]:
+    """Get all links from all users' GitLab wikis"""
+    all_links, failures = await collect_all_links()
+    for failure in failures:
+        logger.warning(f"Could not collect links for {failure['username']}: {failure['error']}")
+    return all_links
+
+
+async def get_user_links_from_gitlab_wiki(username: str) -> List[dict]:
+    """Get links from a specific user's GitLab wiki"""
+    try:
+        # Get user's wiki URL
+        user_data = get_user_by_username(username)
+
+        if not user_data:
+            return []
+
+        wiki_url = user_data[1]
+        mint_session = get_user_session(username)
+
+        # Fetch and parse wiki
+        groups = await fetch_and_parse_wiki(wiki_url, mint_session)
+
+        probe_settings = get_probe_settings()
+        links = []
+        for group in groups:
+            for link in group.links:
+                links.append(build_link_entry(username, group, link, probe_settings))
+
+        return links
+    except Exception as e:
+        logger.warning(f"Could not collect links for {username}: {describe_failure(e)}")
+        return []
@@ -4,7 +4,13 @@ Main application entry point
 from datetime import datetime
 from config import app
 from database import init_db
-from routes import auth_routes, dashboard_routes, admin_routes, status_routes
+from probe_scheduler import scheduler
+from simple_status_check import close_probe_http_client
+from http_client import start_http_client, close_http_client
+from cache import backend as cache_backend
+from cache_sweeper import sweeper as cache_sweeper
+from cache_warmer import warm_recently_active, stop_warmups
+from routes import auth_routes, dashboard_routes, admin_routes, status_routes, webhook_routes
 import logging
 
 # Configure logging
@@ -42,10 +48,22 @@ async def startup_event():
     logger.info("🚀 Starting Synks Application API...")
     logger.info("📊 Monitoring enabled")
     logger.info("🔒 Security middleware active")
+    logger.info(f"🗄️ Wiki cache backend: {cache_backend.name}")
+    await start_http_client()
+    scheduler.start()
+    logger.info(f"📡 Probe scheduler started (every {scheduler.interval}s)")
+    cache_sweeper.start()
+    warming = warm_recently_active()
+    logger.info(f"🔥 Warming the wiki cache for {warming} recently active users")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Application shutdown"""
+    await scheduler.stop()
+    await cache_sweeper.stop()
+    await stop_warmups()
+    await close_probe_http_client()
+    await close_http_client()
     logger.info("👋 Shutting down Synks Application API...")
 
 # Initialize database
@@ -57,6 +75,7 @@ app.include_router(auth_routes.router)
 app.include_router(dashboard_routes.router)
 app.include_router(admin_routes.router)
 app.include_router(status_routes.router)
+app.include_router(webhook_routes.router)
 
 
 @app.get("/api/health")
@@ -40,6 +40,8 @@ class ProductGroup(BaseModel):
 class DashboardResponse(BaseModel):
     groups: List[ProductGroup]
     last_updated: str
+    age_seconds: int = 0
+    stale: bool = False
 
 
 class UserInfo(BaseModel):
@@ -58,3 +60,18 @@ class UpdateUserRequest(BaseModel):
     new_password: Optional[str] = None
     wiki_url: Optional[str] = None
     is_admin: Optional[bool] = None
+
+
+class CacheInvalidateRequest(BaseModel):
+    # Exactly one of these
+    username: Optional[str] = None
+    wiki_url: Optional[str] = None
+    project: Optional[str] = None  # GitLab path with namespace, e.g. "group/project"
+
+
+class ProbeSettingsRequest(BaseModel):
+    url: str
+    mode: str = "http"  # "tcp" or "http"
+    method: Optional[str] = None  # HEAD or GET
+    expected_status: Optional[str] = None  # e.g. "200-399" or "200,204"
+    body_match: Optional[str] = None  # substring the body must contain (forces GET)
@@ -0,0 +1,103 @@
+"""
+Probe dispatcher - global and per-host concurrency limits for status probes
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from config import PROBE_MAX_CONCURRENCY, PROBE_MAX_PER_HOST
+
+logger = logging.getLogger(__name__)
+
+
+class ProbeLimiter:
+    """
+    Hands out probe slots: at most `max_per_host` in-flight probes against
+    one host and `max_total` overall. A probe waits for its host slot
+    before taking a global one, so a crowded host never holds global
+    capacity while it queues. Waiting is counted so callers can report
+    when backpressure is being applied.
+    """
+
+    def __init__(self, max_total: int = PROBE_MAX_CONCURRENCY,
+                 max_per_host: int = PROBE_MAX_PER_HOST):
+        self.max_total = max_total
+        self.max_per_host = max_per_host
+        self._total: Optional[asyncio.Semaphore] = None
+        # host -> [semaphore, number of probes holding or waiting for it]
+        self._hosts: Dict[str, list] = {}
+        self.active = 0
+        self.waiting = 0
+        self.throttled = 0
+        self.max_wait = 0.0
+
+    def _get_total(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running loop
+        if self._total is None:
+            self._total = asyncio.Semaphore(self.max_total)
+        return self._total
+
+    @asynccontextmanager
+    async def slot(self, host: Optional[str]):
+        host = (host or '').lower()
+        entry = self._hosts.get(host)
+        if entry is None:
+            entry = self._hosts[host] = [asyncio.Semaphore(self.max_per_host), 0]
+        entry[1] += 1
+
+        host_semaphore = entry[0]
+        total = self._get_total()
+        must_wait = host_semaphore.locked() or total.locked()
+        started = time.monotonic()
+        if must_wait:
+            self.waiting += 1
+            self.throttled += 1
+
+        try:
+            async with host_semaphore:
+                async with total:
+                    if must_wait:
+                        self.waiting -= 1
+                        must_wait = False
+                        self.max_wait = max(self.max_wait, time.monotonic() - started)
+                    self.active += 1
+                    try:
+                        yield
+                    finally:
+                        self.active -= 1
+        finally:
+            if must_wait:
+                self.waiting -= 1
+            entry[1] -= 1
+            if entry[1] == 0 and self._hosts.get(host) is entry:
+                del self._hosts[host]
+
+    def saturated_hosts(self) -> Dict[str, int]:
+        """Hosts with probes queued behind the per-host limit -> probes in flight or queued"""
+        return {
+            host: count
+            for host, (semaphore, count) in self._hosts.items()
+            if count > self.max_per_host
+        }
+
+    def stats(self) -> dict:
+        return {
+            "maxTotal": self.max_total,
+            "maxPerHost": self.max_per_host,
+            "active": self.active,
+            "waiting": self.waiting,
+            "throttledTotal": self.throttled,
+            "maxWaitSeconds": round(self.max_wait, 3),
+            "saturatedHosts": self.saturated_hosts()
+        }
+
+    def reset_counters(self) -> dict:
+        """Return and clear the throttling counters accumulated since the last call"""
+        counters = {"throttled": self.throttled, "max_wait": self.max_wait}
+        self.throttled = 0
+        self.max_wait = 0.0
+        return counters
+
+
+probe_limiter = ProbeLimiter()
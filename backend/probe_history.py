@@ -0,0 +1,384 @@
+"""
+Probe history - raw probe samples, rollups and uptime queries
+"""
+import math
+import sqlite3
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from config import (
+    DB_NAME,
+    DB_LOCK_TIMEOUT_SECONDS,
+    PROBE_RAW_RETENTION_HOURS,
+    PROBE_MINUTE_ROLLUP_RETENTION_DAYS,
+    PROBE_HOUR_ROLLUP_RETENTION_DAYS,
+    PROBE_UPTIME_WINDOW_DAYS,
+    PROBE_INTERVAL_SECONDS,
+    PROBE_ROLLUP_SETTLE_SECONDS,
+)
+
+MINUTE = 60
+HOUR = 3600
+DAY = 86400
+
+# Weight of samples written before samples carried their interval
+LEGACY_SAMPLE_SECONDS = PROBE_INTERVAL_SECONDS
+
+
+def _percentile(values: List[int], fraction: float) -> Optional[int]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return None
+    rank = max(1, math.ceil(fraction * len(values)))
+    return values[rank - 1]
+
+
+def _weighted_percentile(pairs: List[Tuple[int, int]], fraction: float) -> Optional[int]:
+    """Percentile over (value, weight) pairs, used to merge hourly percentiles"""
+    pairs = sorted(p for p in pairs if p[0] is not None and p[1] > 0)
+    total = sum(weight for _, weight in pairs)
+    if not total:
+        return None
+    threshold = fraction * total
+    running = 0
+    for value, weight in pairs:
+        running += weight
+        if running >= threshold:
+            return value
+    return pairs[-1][0]
+
+
+class ProbeHistoryWriter:
+    """
+    Buffers probe results in memory and writes them in one batch
+    Each sample carries the interval until the next check of its target,
+    so uptime can weigh samples by the time they stand for.
+    With track_latest, each target's newest result is also upserted into
+    probe_latest so other processes can serve it
+    """
+
+    def __init__(self, track_latest: bool = False):
+        self.track_latest = track_latest
+        self._buffer: List[Tuple[str, int, int, int, Optional[int]]] = []
+        self._latest: Dict[str, tuple] = {}
+
+    def record(self, target: str, status_info: Dict, checked_at: Optional[float] = None,
+               interval: Optional[float] = None):
+        """Queue one probe result, standing for the next interval seconds"""
+        checked_at = checked_at if checked_at is not None else time.time()
+        self._buffer.append((
+            target,
+            int(checked_at),
+            1 if status_info.get('status') == 'online' else 0,
+            status_info.get('response_time'),
+            round(interval) if interval is not None else None,
+        ))
+        if self.track_latest:
+            self._latest[target] = (
+                target,
+                status_info.get('status'),
+                status_info.get('response_time'),
+                status_info.get('dns_time'),
+                status_info.get('method'),
+                status_info.get('http_status'),
+                status_info.get('error'),
+                datetime.fromtimestamp(checked_at).isoformat(),
+            )
+
+    def flush(self) -> int:
+        """Write all queued results in a single transaction"""
+        if not self._buffer:
+            return 0
+
+        rows, self._buffer = self._buffer, []
+        latest, self._latest = list(self._latest.values()), {}
+        conn = sqlite3.connect(DB_NAME, timeout=DB_LOCK_TIMEOUT_SECONDS)
+        c = conn.cursor()
+        c.executemany('''
+            INSERT INTO probe_history (target, checked_at, online, response_time, interval_seconds)
+            VALUES (?, ?, ?, ?, ?)
+        ''', rows)
+        if latest:
+            c.executemany('''
+                INSERT OR REPLACE INTO probe_latest
+                (target, status, response_time, dns_time, method, http_status, error, checked_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', latest)
+        conn.commit()
+        conn.close()
+        return len(rows)
+
+
+def get_latest_results() -> Dict[str, dict]:
+    """Newest result per target as written by any probe worker"""
+    conn = sqlite3.connect(DB_NAME)
+    c = conn.cursor()
+    c.execute('''
+        SELECT target, status, response_time, dns_time, method, http_status, error, checked_at
+        FROM probe_latest
+    ''')
+    results = c.fetchall()
+    conn.close()
+
+    latest = {}
+    for target, status, response_time, dns_time, method, http_status, error, checked_at in results:
+        status_info = {
+            "status": status,
+            "response_time": response_time,
+            "dns_time": dns_time,
+            "method": method,
+            "http_status": http_status,
+            "checked_at": checked_at
+        }
+        if error:
+            status_info["error"] = error
+        latest[target] = status_info
+    return latest
+
+
+# Covered time of a rollup row; rows from before samples carried their interval count each sample as one
+_SECONDS = f"COALESCE(seconds, samples * {LEGACY_SAMPLE_SECONDS})"
+_ONLINE_SECONDS = f"COALESCE(online_seconds, online_samples * {LEGACY_SAMPLE_SECONDS})"
+
+
+def _get_watermark(c, bucket_seconds: int, source_table: str) -> Optional[int]:
+    c.execute('SELECT rolled_until FROM probe_rollup_state WHERE bucket_seconds = ?', (bucket_seconds,))
+    result = c.fetchone()
+    if result:
+        return result[0]
+
+    # First run - start at the oldest data we have
+    if source_table == 'probe_history':
+        c.execute('SELECT MIN(checked_at) FROM probe_history')
+    else:
+        c.execute('SELECT MIN(bucket_start) FROM probe_rollups WHERE bucket_seconds = ?', (HOUR,))
+    oldest = c.fetchone()[0]
+    if oldest is None:
+        return None
+    return oldest - oldest % bucket_seconds
+
+
+def _set_watermark(c, bucket_seconds: int, rolled_until: int):
+    c.execute('''
+        INSERT OR REPLACE INTO probe_rollup_state (bucket_seconds, rolled_until)
+        VALUES (?, ?)
+    ''', (bucket_seconds, rolled_until))
+
+
+def _rollup_raw(c, bucket_seconds: int, now: int):
+    """
+    Aggregate closed buckets of raw samples. A bucket counts as closed once
+    it ended PROBE_ROLLUP_SETTLE_SECONDS ago - samples are written in
+    batches, and a late batch behind the watermark would never be rolled up.
+    """
+    start = _get_watermark(c, bucket_seconds, 'probe_history')
+    settled = now - PROBE_ROLLUP_SETTLE_SECONDS
+    end = settled - settled % bucket_seconds
+    if start is None or start >= end:
+        return
+
+    c.execute('''
+        SELECT target, checked_at, online, response_time, COALESCE(interval_seconds, ?)
+        FROM probe_history
+        WHERE checked_at >= ? AND checked_at < ?
+    ''', (LEGACY_SAMPLE_SECONDS, start, end))
+
+    buckets: Dict[Tuple[str, int], List] = {}
+    for target, checked_at, online, response_time, seconds in c.fetchall():
+        bucket = buckets.setdefault((target, checked_at - checked_at % bucket_seconds), [0, 0, [], 0, 0])
+        bucket[0] += 1
+        bucket[3] += seconds
+        if online:
+            bucket[1] += 1
+            bucket[4] += seconds
+            if response_time is not None:
+                bucket[2].append(response_time)
+
+    rows = []
+    for (target, bucket_start), (samples, online_samples, times, seconds, online_seconds) in buckets.items():
+        times.sort()
+        rows.append((target, bucket_seconds, bucket_start, samples, online_samples,
+                     _percentile(times, 0.50), _percentile(times, 0.95), seconds, online_seconds))
+
+    c.executemany('''
+        INSERT OR REPLACE INTO probe_rollups
+        (target, bucket_seconds, bucket_start, samples, online_samples,
+         p50_response_time, p95_response_time, seconds, online_seconds)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    _set_watermark(c, bucket_seconds, end)
+
+
+def _rollup_days(c):
+    """
+    Aggregate closed days from hourly rollups
+
+    Percentiles cannot be merged exactly, so daily p50/p95 are the
+    sample-weighted percentiles of the hourly values.
+    """
+    start = _get_watermark(c, DAY, 'probe_rollups')
+    hour_watermark = _get_watermark(c, HOUR, 'probe_history')
+    if start is None or hour_watermark is None:
+        return
+    end = hour_watermark - hour_watermark % DAY
+    if start >= end:
+        return
+
+    c.execute(f'''
+        SELECT target, bucket_start, samples, online_samples, p50_response_time, p95_response_time,
+               {_SECONDS}, {_ONLINE_SECONDS}
+        FROM probe_rollups
+        WHERE bucket_seconds = ? AND bucket_start >= ? AND bucket_start < ?
+    ''', (HOUR, start, end))
+
+    days: Dict[Tuple[str, int], List] = {}
+    for target, bucket_start, samples, online_samples, p50, p95, seconds, online_seconds in c.fetchall():
+        day = days.setdefault((target, bucket_start - bucket_start % DAY), [0, 0, [], [], 0, 0])
+        day[0] += samples
+        day[1] += online_samples
+        day[2].append((p50, online_samples))
+        day[3].append((p95, online_samples))
+        day[4] += seconds
+        day[5] += online_seconds
+
+    rows = []
+    for (target, bucket_start), (samples, online_samples, p50s, p95s, seconds, online_seconds) in days.items():
+        rows.append((target, DAY, bucket_start, samples, online_samples,
+                     _weighted_percentile(p50s, 0.50), _weighted_percentile(p95s, 0.95),
+                     seconds, online_seconds))
+
+    c.executemany('''
+        INSERT OR REPLACE INTO probe_rollups
+        (target, bucket_seconds, bucket_start, samples, online_samples,
+         p50_response_time, p95_response_time, seconds, online_seconds)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    _set_watermark(c, DAY, end)
+
+
+def _prune(c, now: int):
+    """Apply the retention policy; raw rows are only dropped once rolled up"""
+    hour_watermark = _get_watermark(c, HOUR, 'probe_history') or 0
+    raw_cutoff = min(now - PROBE_RAW_RETENTION_HOURS * HOUR, hour_watermark)
+    c.execute('DELETE FROM probe_history WHERE checked_at < ?', (raw_cutoff,))
+
+    c.execute('DELETE FROM probe_rollups WHERE bucket_seconds = ? AND bucket_start < ?',
+              (MINUTE, now - PROBE_MINUTE_ROLLUP_RETENTION_DAYS * DAY))
+
+    day_watermark = _get_watermark(c, DAY, 'probe_rollups') or 0
+    hour_cutoff = min(now - PROBE_HOUR_ROLLUP_RETENTION_DAYS * DAY, day_watermark)
+    c.execute('DELETE FROM probe_rollups WHERE bucket_seconds = ? AND bucket_start < ?',
+              (HOUR, hour_cutoff))
+
+
+def run_rollups(now: Optional[float] = None, prune: bool = True):
+    """Roll up closed buckets at every level and optionally prune old rows"""
+    now = int(now if now is not None else time.time())
+    conn = sqlite3.connect(DB_NAME, timeout=DB_LOCK_TIMEOUT_SECONDS)
+    conn.isolation_level = None
+    c = conn.cursor()
+
+    # Take the write lock up front so watermarks are read and advanced atomically
+    c.execute('BEGIN IMMEDIATE')
+    try:
+        _rollup_raw(c, MINUTE, now)
+        _rollup_raw(c, HOUR, now)
+        _rollup_days(c)
+        if prune:
+            _prune(c, now)
+        c.execute('COMMIT')
+    except Exception:
+        c.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+
+def get_uptime(days: int = PROBE_UPTIME_WINDOW_DAYS, now: Optional[float] = None) -> Dict[str, float]:
+    """
+    Uptime percentage per target over the last `days` days, as the share of
+    probed time the target was online - stable targets are sampled less
+    often than failing ones, so samples are weighed by the interval they cover
+
+    Whole days come from daily rollups, the current day from hourly
+    rollups and the unrolled tail from raw samples, so the cost depends on
+    the number of targets rather than on the number of samples.
+    """
+    now = int(now if now is not None else time.time())
+    window_start = now - days * DAY
+    window_start -= window_start % DAY
+
+    conn = sqlite3.connect(DB_NAME)
+    c = conn.cursor()
+    hour_watermark = _get_watermark(c, HOUR, 'probe_history')
+    day_watermark = _get_watermark(c, DAY, 'probe_rollups')
+    if hour_watermark is None:
+        hour_watermark = window_start
+    if day_watermark is None:
+        day_watermark = window_start
+    day_watermark = max(window_start, min(day_watermark, hour_watermark))
+    hour_watermark = max(day_watermark, hour_watermark)
+
+    totals: Dict[str, List[int]] = {}
+
+    def add(rows: Iterable):
+        for target, seconds, online_seconds in rows:
+            total = totals.setdefault(target, [0, 0])
+            total[0] += seconds or 0
+            total[1] += online_seconds or 0
+
+    c.execute(f'''
+        SELECT target, SUM({_SECONDS}), SUM({_ONLINE_SECONDS})
+        FROM probe_rollups
+        WHERE bucket_seconds = ? AND bucket_start >= ? AND bucket_start < ?
+        GROUP BY target
+    ''', (DAY, window_start, day_watermark))
+    add(c.fetchall())
+
+    c.execute(f'''
+        SELECT target, SUM({_SECONDS}), SUM({_ONLINE_SECONDS})
+        FROM probe_rollups
+        WHERE bucket_seconds = ? AND bucket_start >= ? AND bucket_start < ?
+        GROUP BY target
+    ''', (HOUR, day_watermark, hour_watermark))
+    add(c.fetchall())
+
+    c.execute('''
+        SELECT target, SUM(COALESCE(interval_seconds, ?)), SUM(online * COALESCE(interval_seconds, ?))
+        FROM probe_history
+        WHERE checked_at >= ?
+        GROUP BY target
+    ''', (LEGACY_SAMPLE_SECONDS, LEGACY_SAMPLE_SECONDS, hour_watermark))
+    add(c.fetchall())
+    conn.close()
+
+    return {
+        target: round(100.0 * online_seconds / seconds, 2)
+        for target, (seconds, online_seconds) in totals.items()
+        if seconds
+    }
+
+
+def get_rollups(target: str, bucket_seconds: int, since: int) -> List[dict]:
+    """Rollup series for one target, oldest first"""
+    conn = sqlite3.connect(DB_NAME)
+    c = conn.cursor()
+    c.execute(f'''
+        SELECT bucket_start, samples, {_SECONDS}, {_ONLINE_SECONDS}, p50_response_time, p95_response_time
+        FROM probe_rollups
+        WHERE target = ? AND bucket_seconds = ? AND bucket_start >= ?
+        ORDER BY bucket_start
+    ''', (target, bucket_seconds, since))
+    results = c.fetchall()
+    conn.close()
+
+    return [
+        {
+            "bucket_start": row[0],
+            "samples": row[1],
+            "uptime": round(100.0 * row[3] / row[2], 2) if row[2] else None,
+            "p50_response_time": row[4],
+            "p95_response_time": row[5],
+        }
+        for row in results
+    ]
@@ -0,0 +1,106 @@
+"""
+Shard leases - divide probe targets between worker processes via the shared database
+"""
+import math
+import sqlite3
+import time
+import zlib
+from typing import Set
+from config import DB_NAME, DB_LOCK_TIMEOUT_SECONDS, PROBE_SHARDS, PROBE_LEASE_TTL_SECONDS
+
+
+def shard_for_target(target: str, shards: int = PROBE_SHARDS) -> int:
+    """Stable shard number for a probe target, identical in every process"""
+    return zlib.crc32(target.encode()) % shards
+
+
+class ShardLeaseManager:
+    """
+    Keeps this worker's share of the probe shards
+
+    Every renewal heartbeats the worker, forgets workers whose heartbeat is
+    older than the lease TTL, and rebalances to ceil(shards / live workers):
+    surplus leases are released, missing ones are claimed from shards that
+    are free or whose lease expired (their worker died). All of it runs in
+    one write transaction so workers never claim the same shard.
+    """
+
+    def __init__(self, worker_id: str, shards: int = PROBE_SHARDS,
+                 ttl: float = PROBE_LEASE_TTL_SECONDS):
+        self.worker_id = worker_id
+        self.shards = shards
+        self.ttl = ttl
+        self.owned: Set[int] = set()
+        self.renewed_at: float = 0.0
+
+    @property
+    def valid(self) -> bool:
+        """Our leases are only trustworthy until they could have expired"""
+        return time.time() < self.renewed_at + self.ttl
+
+    def owns(self, target: str) -> bool:
+        return self.valid and shard_for_target(target, self.shards) in self.owned
+
+    def renew(self) -> Set[int]:
+        """Heartbeat, rebalance and extend our leases; returns the shards we own"""
+        now = time.time()
+        conn = sqlite3.connect(DB_NAME, timeout=DB_LOCK_TIMEOUT_SECONDS)
+        conn.isolation_level = None
+        c = conn.cursor()
+
+        try:
+            c.execute('BEGIN IMMEDIATE')
+
+            c.execute('''
+                INSERT OR REPLACE INTO probe_workers (worker_id, heartbeat_at)
+                VALUES (?, ?)
+            ''', (self.worker_id, now))
+            c.execute('DELETE FROM probe_workers WHERE heartbeat_at < ?', (now - self.ttl,))
+            c.execute('SELECT COUNT(*) FROM probe_workers')
+            live_workers = c.fetchone()[0]
+            share = math.ceil(self.shards / max(1, live_workers))
+
+            c.execute('SELECT shard, owner, expires_at FROM probe_leases')
+            leases = {shard: (owner, expires_at) for shard, owner, expires_at in c.fetchall()}
+
+            mine = sorted(shard for shard, (owner, _) in leases.items() if owner == self.worker_id)
+            free = [
+                shard for shard in range(self.shards)
+                if shard not in leases or (leases[shard][0] != self.worker_id and leases[shard][1] < now)
+            ]
+
+            if len(mine) > share:
+                c.executemany('DELETE FROM probe_leases WHERE shard = ? AND owner = ?',
+                              [(shard, self.worker_id) for shard in mine[share:]])
+                mine = mine[:share]
+            elif len(mine) < share:
+                claimed = free[:share - len(mine)]
+                c.executemany('''
+                    INSERT OR REPLACE INTO probe_leases (shard, owner, expires_at)
+                    VALUES (?, ?, ?)
+                ''', [(shard, self.worker_id, now + self.ttl) for shard in claimed])
+                mine = mine + claimed
+
+            c.execute('UPDATE probe_leases SET expires_at = ? WHERE owner = ?',
+                      (now + self.ttl, self.worker_id))
+            c.execute('COMMIT')
+        except Exception:
+            c.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+        self.owned = set(mine)
+        self.renewed_at = now
+        return self.owned
+
+    def release(self):
+        """Give up all leases so other workers take them over right away"""
+        conn = sqlite3.connect(DB_NAME, timeout=DB_LOCK_TIMEOUT_SECONDS)
+        c = conn.cursor()
+        c.execute('DELETE FROM probe_leases WHERE owner = ?', (self.worker_id,))
+        c.execute('DELETE FROM probe_workers WHERE worker_id = ?', (self.worker_id,))
+        conn.commit()
+        conn.close()
+        self.owned = set()
+        self.renewed_at = 0.0
@@ -0,0 +1,531 @@
+"""
+Background probe scheduler - keeps an in-memory snapshot of link statuses
+"""
+import asyncio
+import logging
+import os
+import random
+import socket
+import time
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from config import (
+    PROBE_INTERVAL_SECONDS,
+    PROBE_MIN_INTERVAL_SECONDS,
+    PROBE_MAX_INTERVAL_SECONDS,
+    PROBE_BACKOFF_FACTOR,
+    PROBE_TICK_SECONDS,
+    PROBE_SCHEDULE_JITTER,
+    PROBE_SCHEDULER_MODE,
+    PROBE_OFFLINE_CONFIRM_RETRIES,
+    PROBE_OFFLINE_CONFIRM_DELAY_SECONDS,
+)
+from link_catalog import collect_all_links
+from probe_dispatcher import probe_limiter
+from probe_history import ProbeHistoryWriter, run_rollups, get_uptime, get_latest_results
+from probe_leases import ShardLeaseManager
+from simple_status_check import check_link_status
+
+logger = logging.getLogger(__name__)
+
+
+def build_status_record(link: dict, status_info: Optional[Dict],
+                        uptime: Optional[float] = None,
+                        checked_at: Optional[datetime] = None) -> dict:
+    """Build the status payload for a link from a probe result"""
+    last_checked = (checked_at or datetime.now()).isoformat()
+    if status_info is None:
+        return {
+            "id": link['id'],
+            "name": link['name'],
+            "url": link['url'],
+            "product": link.get('product', 'Uncategorized'),
+            "environment": link.get('environment', 'Default'),
+            "status": "unknown",
+            "responseTime": 0,
+            "uptime": 0,
+            "lastChecked": last_checked
+        }
+
+    return {
+        "id": link['id'],
+        "name": link['name'],
+        "url": link['url'],
+        "product": link.get('product', 'Uncategorized'),
+        "environment": link.get('environment', 'Default'),
+        "status": status_info['status'],
+        "responseTime": status_info['response_time'],
+        "dnsTime": status_info.get('dns_time'),
+        "method": status_info.get('method'),
+        "httpStatus": status_info.get('http_status'),
+        "uptime": uptime if uptime is not None else (100 if status_info['status'] == 'online' else 0),
+        "lastChecked": last_checked
+    }
+
+
+def build_target_index(links: List[dict]) -> Dict[str, List[int]]:
+    """
+    Collapse links onto their probe targets
+    Returns {target: [positions in links]}; unparsable URLs keep their own entry
+    """
+    index: Dict[str, List[int]] = {}
+    for position, link in enumerate(links):
+        target = link.get('target') or link['url']
+        index.setdefault(target, []).append(position)
+    return index
+
+
+async def check_links(links: List[dict]) -> Tuple[List[Optional[Dict]], Dict[str, Dict]]:
+    """
+    Probe each distinct target once and fan the result out to its links
+    Returns (per-link results, per-target results); None marks a probe that raised
+    """
+    index = build_target_index(links)
+
+    async def check_target(positions):
+        link = links[positions[0]]
+        try:
+            return await check_link_status(link['url'], spec=link.get('probe'))
+        except Exception as e:
+            logger.error(f"Probe of {link['url']} failed: {e}")
+            return None
+
+    targets = list(index)
+    outcomes = await asyncio.gather(*[check_target(index[target]) for target in targets])
+
+    results: List[Optional[Dict]] = [None] * len(links)
+    target_results: Dict[str, Dict] = {}
+    for target, status_info in zip(targets, outcomes):
+        for position in index[target]:
+            results[position] = status_info
+        if status_info is not None:
+            target_results[target] = status_info
+
+    return results, target_results
+
+
+def link_uptime(link: dict, uptime: Dict[str, float]) -> Optional[float]:
+    return uptime.get(link.get('target') or link['url'])
+
+
+async def probe_links(links: List[dict], uptime: Optional[Dict[str, float]] = None) -> List[dict]:
+    """Probe every link concurrently and return their status records"""
+    uptime = uptime or {}
+    results, _ = await check_links(links)
+    return [
+        build_status_record(link, status_info, link_uptime(link, uptime))
+        for link, status_info in zip(links, results)
+    ]
+
+
+async def iter_link_statuses(links: List[dict],
+                             uptime: Optional[Dict[str, float]] = None) -> AsyncIterator[dict]:
+    """
+    Probe each distinct target once and yield status records for its links
+    as soon as that probe finishes, fastest targets first
+    """
+    uptime = uptime or {}
+    index = build_target_index(links)
+
+    async def check_target(target):
+        link = links[index[target][0]]
+        try:
+            return target, await check_link_status(link['url'], spec=link.get('probe'))
+        except Exception as e:
+            logger.error(f"Probe of {link['url']} failed: {e}")
+            return target, None
+
+    tasks = [asyncio.ensure_future(check_target(target)) for target in index]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            target, status_info = await next_done
+            for position in index[target]:
+                link = links[position]
+                yield build_status_record(link, status_info, link_uptime(link, uptime))
+    finally:
+        # Client went away mid-stream - drop the remaining probes
+        for task in tasks:
+            task.cancel()
+
+
+class TargetState:
+    """
+    Probe state and adaptive schedule for one host:port target
+
+    Stable targets back off geometrically up to PROBE_MAX_INTERVAL_SECONDS
+    (offline targets stop at the base interval so recoveries are seen
+    promptly); a state change drops the interval to
+    PROBE_MIN_INTERVAL_SECONDS so the new state is re-checked soon. Every
+    next check time is jittered so targets do not fall into lockstep.
+
+    An online target that fails a probe is re-probed on the next ticks and
+    only reported offline once PROBE_OFFLINE_CONFIRM_RETRIES more probes
+    fail, so one dropped SYN is not an outage.
+    """
+
+    def __init__(self, url: str, spec: Optional[dict] = None, next_due: float = 0.0):
+        self.url = url
+        self.spec = spec
+        self.status_info: Optional[Dict] = None
+        self.checked_at: Optional[datetime] = None
+        self.interval: float = PROBE_INTERVAL_SECONDS
+        self.next_due = next_due
+        self.changes = 0
+        self.unconfirmed = 0
+
+    def schedule(self, now: float):
+        jitter = random.uniform(-PROBE_SCHEDULE_JITTER, PROBE_SCHEDULE_JITTER)
+        self.next_due = now + self.interval * (1 + jitter)
+
+    @property
+    def online(self) -> bool:
+        return self.status_info is not None and self.status_info['status'] == 'online'
+
+    def hold_offline(self, status_info: Dict, now: float) -> bool:
+        """
+        Whether an offline result still needs confirming before it is
+        applied; if so, the target is re-probed after a short delay
+        """
+        if not self.online or status_info['status'] != 'offline':
+            self.unconfirmed = 0
+            return False
+        if self.unconfirmed >= PROBE_OFFLINE_CONFIRM_RETRIES:
+            status_info['attempts'] = self.unconfirmed + 1
+            self.unconfirmed = 0
+            return False
+        self.unconfirmed += 1
+        self.next_due = now + PROBE_OFFLINE_CONFIRM_DELAY_SECONDS
+        return True
+
+    def update(self, status_info: Dict, now: float) -> bool:
+        """Apply a probe result and schedule the next check; returns True on a state change"""
+        previous = self.status_info['status'] if self.status_info else None
+        changed = previous is not None and previous != status_info['status']
+
+        if changed:
+            self.changes += 1
+            self.interval = PROBE_MIN_INTERVAL_SECONDS
+        elif previous is not None:
+            ceiling = PROBE_MAX_INTERVAL_SECONDS if status_info['status'] == 'online' else PROBE_INTERVAL_SECONDS
+            self.interval = min(ceiling, self.interval * PROBE_BACKOFF_FACTOR)
+
+        self.status_info = status_info
+        self.checked_at = datetime.now()
+        self.schedule(now)
+        return changed
+
+
+class ProbeScheduler:
+    """
+    Keeps per-target probe schedules for the link catalog and serves the
+    latest results from memory
+
+    The catalog is re-read every `interval` seconds; every tick only the
+    targets whose adaptive schedule is due get probed.
+
+    In "sharded" mode the scheduler only probes targets in shards it holds
+    leases for and builds its snapshot from the probe_latest table that all
+    workers write to; in "external" mode it never probes and only reads
+    probe_latest.
+    """
+
+    MODES = ("embedded", "sharded", "external")
+
+    def __init__(self, interval: float = PROBE_INTERVAL_SECONDS, tick: float = PROBE_TICK_SECONDS,
+                 mode: str = PROBE_SCHEDULER_MODE, worker_id: Optional[str] = None):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown PROBE_SCHEDULER_MODE {mode!r}, expected one of {', '.join(self.MODES)}")
+        self.interval = interval
+        self.tick = tick
+        self.mode = mode
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.leases = ShardLeaseManager(self.worker_id) if mode == "sharded" else None
+        self.catalog: List[dict] = []
+        self.catalog_failures: List[dict] = []
+        self.targets: Dict[str, TargetState] = {}
+        self.links: List[dict] = []
+        self.links_by_user: Dict[str, List[dict]] = {}
+        self.uptime: Dict[str, float] = {}
+        self.history = ProbeHistoryWriter(track_latest=mode != "embedded")
+        self.last_sweep_at: Optional[datetime] = None
+        self.last_sweep_duration: Optional[float] = None
+        self.last_probed = 0
+        self.last_throttled = 0
+        self._catalog_loaded_at: Optional[float] = None
+        self._maintained_at: Optional[float] = None
+        self._leases_renewed_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._ready: Optional[asyncio.Event] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def ready(self) -> bool:
+        return self.last_sweep_at is not None
+
+    def start(self):
+        """Start the scheduling loop on the running event loop"""
+        if self.running:
+            return
+        self._ready = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the scheduling loop and wait for it to exit"""
+        if not self._task:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        if self.leases:
+            try:
+                await asyncio.to_thread(self.history.flush)
+                await asyncio.to_thread(self.leases.release)
+            except Exception as e:
+                logger.error(f"Releasing probe leases failed: {e}")
+
+    async def serve(self):
+        """Run the scheduling loop until cancelled (used by probe_worker.py)"""
+        self.start()
+        try:
+            await self._task
+        finally:
+            await self.stop()
+
+    def owns(self, target: str) -> bool:
+        """Whether this process is responsible for probing a target"""
+        if self.mode == "external":
+            return False
+        if self.leases:
+            return self.leases.owns(target)
+        return True
+
+    async def _renew_leases(self):
+        now = time.monotonic()
+        if self._leases_renewed_at is not None and now - self._leases_renewed_at < self.leases.ttl / 3:
+            return
+        try:
+            previous = self.leases.owned
+            owned = await asyncio.to_thread(self.leases.renew)
+            self._leases_renewed_at = now
+            if owned != previous:
+                logger.info(f"Probe worker {self.worker_id} now holds {len(owned)} shards")
+        except Exception as e:
+            logger.error(f"Renewing probe leases failed: {e}")
+
+    async def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the first sweep has completed"""
+        if self.ready:
+            return True
+        if not self.running:
+            return False
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.ready
+
+    async def refresh_catalog(self):
+        """Re-read the link catalog, keeping schedules of known targets"""
+        links, failures = await collect_all_links()
+        for failure in failures:
+            logger.warning(f"Could not collect links for {failure['username']}: {failure['error']}")
+        index = build_target_index(links)
+
+        # New targets are spread out instead of all being probed on the next
+        # tick: over the base interval on the first load (e.g. after a
+        # restart), over the minimum interval for targets added later
+        now = time.monotonic()
+        spread = PROBE_MIN_INTERVAL_SECONDS if self.targets else self.interval
+
+        targets = {}
+        for target, positions in index.items():
+            link = links[positions[0]]
+            state = self.targets.get(target)
+            if state is None:
+                state = TargetState(link['url'], link.get('probe'), now + random.uniform(0, spread))
+            else:
+                # Settings such as expected_status or body_match can change
+                # without changing the target key
+                state.url = link['url']
+                state.spec = link.get('probe')
+            targets[target] = state
+
+        self.catalog = links
+        self.catalog_failures = failures
+        self.targets = targets
+        self._catalog_loaded_at = time.monotonic()
+
+    def invalidate_catalog(self):
+        """Re-read the link catalog on the next tick instead of waiting out the interval"""
+        self._catalog_loaded_at = None
+
+    async def _probe_target(self, state: TargetState) -> Optional[Dict]:
+        # One probe per target and tick - outage confirmations are re-probed
+        # on later ticks, so a flapping target does not hold up the others
+        try:
+            return await check_link_status(state.url, spec=state.spec)
+        except Exception as e:
+            logger.error(f"Probe of {state.url} failed: {e}")
+            return None
+
+    async def probe_due(self) -> int:
+        """Probe every target whose schedule is due; returns the number probed"""
+        now = time.monotonic()
+        due = [
+            (target, state) for target, state in self.targets.items()
+            if state.next_due <= now and self.owns(target)
+        ]
+        if not due:
+            return 0
+
+        results = await asyncio.gather(*[self._probe_target(state) for _, state in due])
+        checked_at = time.time()
+        finished = time.monotonic()
+
+        changes = 0
+        for (target, state), status_info in zip(due, results):
+            if status_info is None:
+                state.schedule(finished)
+                continue
+            if state.hold_offline(status_info, finished):
+                continue
+            if state.update(status_info, finished):
+                changes += 1
+            self.history.record(target, status_info, checked_at, state.interval)
+
+        if changes:
+            logger.info(f"{changes} probe targets changed state")
+
+        throttling = probe_limiter.reset_counters()
+        self.last_throttled = throttling['throttled']
+        if throttling['throttled']:
+            logger.warning(
+                f"Probe backpressure: {throttling['throttled']} of {len(due)} probes queued "
+                f"for a slot (max wait {throttling['max_wait']:.1f}s)"
+            )
+        return len(due)
+
+    def _runs_rollups(self) -> bool:
+        # With several workers only the holder of shard 0 rolls up and prunes
+        if self.mode == "external":
+            return False
+        if self.leases:
+            return self.leases.valid and 0 in self.leases.owned
+        return True
+
+    async def _maintain_history(self):
+        """Write buffered samples; roll up and refresh uptime once per interval"""
+        try:
+            await asyncio.to_thread(self.history.flush)
+
+            now = time.monotonic()
+            if self._maintained_at is None or now - self._maintained_at >= self.interval:
+                if self._runs_rollups():
+                    await asyncio.to_thread(run_rollups)
+                self.uptime = await asyncio.to_thread(get_uptime)
+                self._maintained_at = now
+        except Exception as e:
+            logger.error(f"Probe history update failed: {e}")
+
+    async def _result_source(self) -> Dict[str, Tuple[Optional[Dict], Optional[datetime]]]:
+        """target -> (latest result, checked at), from memory or from probe_latest"""
+        if self.mode == "embedded":
+            return {
+                target: (state.status_info, state.checked_at)
+                for target, state in self.targets.items()
+            }
+
+        latest = await asyncio.to_thread(get_latest_results)
+        return {
+            target: (status_info, datetime.fromisoformat(status_info['checked_at']))
+            for target, status_info in latest.items()
+        }
+
+    def _rebuild_snapshot(self, results: Dict[str, Tuple[Optional[Dict], Optional[datetime]]]):
+        records = []
+        links_by_user: Dict[str, List[dict]] = {}
+        for link in self.catalog:
+            status_info, checked_at = results.get(link.get('target') or link['url'], (None, None))
+            record = build_status_record(
+                link,
+                status_info,
+                link_uptime(link, self.uptime),
+                checked_at
+            )
+            records.append(record)
+            links_by_user.setdefault(link['username'], []).append(record)
+
+        # Swap references so readers never see a half-built snapshot
+        self.links = records
+        self.links_by_user = links_by_user
+
+    async def sweep(self):
+        """One scheduler tick: refresh the catalog if due, probe due targets, update the snapshot"""
+        started = time.monotonic()
+        if self._catalog_loaded_at is None or started - self._catalog_loaded_at >= self.interval:
+            await self.refresh_catalog()
+
+        if self.leases:
+            await self._renew_leases()
+
+        probed = await self.probe_due()
+        self.last_probed = probed
+        await self._maintain_history()
+        self._rebuild_snapshot(await self._result_source())
+
+        self.last_sweep_at = datetime.now()
+        self.last_sweep_duration = time.monotonic() - started
+        if self._ready:
+            self._ready.set()
+
+        if probed:
+            logger.info(
+                f"Probe tick finished: {probed}/{len(self.targets)} targets due, "
+                f"{len(self.links)} links in {self.last_sweep_duration:.1f}s"
+            )
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Probe sweep failed: {e}")
+
+            elapsed = time.monotonic() - started
+            await asyncio.sleep(max(0.0, self.tick - elapsed))
+
+    def stats(self) -> dict:
+        """Scheduler and dispatcher state for monitoring"""
+        now = time.monotonic()
+        return {
+            "running": self.running,
+            "mode": self.mode,
+            "workerId": self.worker_id,
+            "ownedShards": sorted(self.leases.owned) if self.leases else None,
+            "links": len(self.catalog),
+            "catalogFailures": self.catalog_failures,
+            "targets": len(self.targets),
+            "dueNow": sum(1 for state in self.targets.values() if state.next_due <= now),
+            "lastTick": self.last_sweep_at.isoformat() if self.last_sweep_at else None,
+            "lastTickSeconds": self.last_sweep_duration,
+            "lastTickProbed": self.last_probed,
+            "lastTickThrottled": self.last_throttled,
+            "dispatcher": probe_limiter.stats()
+        }
+
+    def get_user_links(self, username: str) -> Optional[List[dict]]:
+        """Latest records for a user, or None if the user is not in the snapshot"""
+        return self.links_by_user.get(username)
+
+
+scheduler = ProbeScheduler()
@@ -0,0 +1,73 @@
+"""
+Standalone probe worker
+
+Runs the probe scheduler in sharded mode: the worker takes its share of
+the target shards via leases in the shared database, probes them and
+writes results to the shared history. Start as many as needed, on one
+machine or several sharing the database:
+
+    python probe_worker.py --worker-id probe-1
+    python probe_worker.py --worker-id probe-2
+
+Set the PROBE_SCHEDULER_MODE environment variable of the API to "external"
+(API only serves results) or "sharded" (API also takes a share) when
+running workers.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+from database import init_db
+from probe_scheduler import ProbeScheduler
+from simple_status_check import close_probe_http_client
+from http_client import close_http_client
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+async def run_worker(worker_id: str):
+    worker = ProbeScheduler(mode="sharded", worker_id=worker_id)
+
+    # Stop cleanly on SIGTERM so the leases are released, not left to expire
+    main_task = asyncio.current_task()
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(signal.SIGTERM, main_task.cancel)
+    except NotImplementedError:
+        pass
+
+    logger.info(f"📡 Probe worker {worker_id} starting")
+    try:
+        await worker.serve()
+    except asyncio.CancelledError:
+        pass
+    finally:
+        await close_probe_http_client()
+        await close_http_client()
+        logger.info(f"👋 Probe worker {worker_id} stopped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synks probe worker")
+    parser.add_argument(
+        "--worker-id",
+        default=f"{socket.gethostname()}-{os.getpid()}",
+        help="Unique name for this worker (default: hostname-pid)"
+    )
+    args = parser.parse_args()
+
+    init_db()
+    try:
+        asyncio.run(run_worker(args.worker_id))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,16 @@
 """
-Admin routes - user management
+Admin routes - user management and wiki cache state
 """
 from fastapi import APIRouter, HTTPException, Depends
-from models import UsersListResponse, UpdateUserRequest
+from models import UsersListResponse, UpdateUserRequest, CacheInvalidateRequest
 from auth import get_current_user, require_admin
+from config import CACHE_REWARM_CONCURRENCY, CACHE_REWARM_PAUSE_SECONDS
 from database import get_all_users, update_user, delete_user
+from cache import cache_stats, expire_all_cache
+from cache_invalidation import invalidate_user, invalidate_wiki_url, invalidate_project
+from cache_sweeper import sweeper
+from cache_warmer import schedule_warmup
+from probe_scheduler import scheduler
 
 router = APIRouter(prefix="/api", tags=["admin"])
 
@@ -72,3 +78,64 @@ async def delete_user_endpoint(
         )
 
     return {"message": "User deleted successfully"}
+
+
+@router.get("/cache/stats")
+async def get_cache_stats(current_user: dict = Depends(get_current_user)):
+    """
+    Wiki cache entry counts and sizes, and the sweeper's state (admin only)
+    """
+    require_admin(current_user)
+    stats = await cache_stats()
+    stats['sweeper'] = sweeper.stats()
+    return stats
+
+
+@router.post("/cache/invalidate")
+async def invalidate_cache_endpoint(
+    request: CacheInvalidateRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Drop cached wikis for one user, one wiki URL or one GitLab project (admin only)
+    """
+    require_admin(current_user)
+
+    targets = [target for target in (request.username, request.wiki_url, request.project) if target]
+    if len(targets) != 1:
+        raise HTTPException(
+            status_code=400,
+            detail="Give exactly one of username, wiki_url or project"
+        )
+
+    if request.username:
+        result = await invalidate_user(request.username)
+        if result is None:
+            raise HTTPException(
+                status_code=404,
+                detail="User not found"
+            )
+    elif request.wiki_url:
+        result = await invalidate_wiki_url(request.wiki_url)
+    else:
+        result = await invalidate_project(request.project)
+
+    if result['removed']:
+        scheduler.invalidate_catalog()
+
+    return result
+
+
+@router.post("/cache/flush")
+async def flush_cache(current_user: dict = Depends(get_current_user)):
+    """
+    Expire the whole wiki cache and revalidate it gradually in the background (admin only).
+    Entries are kept, so dashboards are served stale meanwhile instead of all missing at once.
+    """
+    require_admin(current_user)
+
+    expired = await expire_all_cache()
+    users = [user for user in get_all_users() if user['wiki_url']]
+    schedule_warmup(users, CACHE_REWARM_CONCURRENCY, CACHE_REWARM_PAUSE_SECONDS, revalidate=True)
+
+    return {"message": "Cache expired, revalidating in the background", "expired": expired, "rewarming": len(users)}
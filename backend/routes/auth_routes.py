@@ -6,6 +6,7 @@ from models import RegisterRequest, LoginRequest, LoginResponse
 from database import create_user, create_session, get_user_by_username, delete_session
 from auth import authenticate_with_mint, get_current_user
 from config import MINT_URL
+from cache_warmer import warm_user_wiki
 
 router = APIRouter(prefix="/api", tags=["auth"])
 
@@ -78,6 +79,9 @@ async def login(request: LoginRequest):
     # Create session with GitLab session
     token = create_session(request.username, mint_session)
 
+    # Load the wiki while the response goes out, so the first dashboard view is a cache hit
+    warm_user_wiki(user_data[0], user_data[1])
+
     return LoginResponse(
         token=token,
         username=user_data[0],
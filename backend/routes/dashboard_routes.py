@@ -1,17 +1,36 @@
 """
 Dashboard routes - fetching and displaying wiki content
 """
-from fastapi import APIRouter, HTTPException, Depends
-from datetime import datetime
+from fastapi import APIRouter, HTTPException, Depends, Response
+import json
 from models import DashboardResponse
 from auth import get_current_user
 from database import get_user_session
-from wiki import fetch_and_parse_wiki, extract_api_url_from_wiki_url
-from cache import get_cached_content, cache_content, clear_all_cache
+from wiki import WikiPage, load_wiki, extract_api_url_from_wiki_url
+from cache_invalidation import invalidate_wiki_url
 
 router = APIRouter(prefix="/api", tags=["dashboard"])
 
 
+def dashboard_response(page: WikiPage) -> Response:
+    """
+    DashboardResponse JSON built around the page's pre-serialized groups,
+    so hot dashboards need no JSON decoding, parsing or model building.
+    last_updated is when the data was last confirmed upstream.
+    """
+    body = '{"groups":%s,"last_updated":%s,"age_seconds":%d,"stale":%s}' % (
+        page.groups_json,
+        json.dumps(page.cached_at.isoformat()),
+        page.age_seconds,
+        json.dumps(page.stale)
+    )
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"Age": str(page.age_seconds), "X-Cache": page.source}
+    )
+
+
 @router.get("/dashboard", response_model=DashboardResponse)
 async def get_dashboard(current_user: dict = Depends(get_current_user)):
     """
@@ -30,29 +49,10 @@ async def get_dashboard(current_user: dict = Depends(get_current_user)):
         # Convert to API URL
         api_url = extract_api_url_from_wiki_url(wiki_url)
 
-        # Check cache first
-        cached = get_cached_content(api_url)
-
-        if cached:
-            # Parse cached content
-            import json
-            from wiki import parse_markdown_links
-            wiki_data = json.loads(cached)
-            markdown_text = wiki_data.get('content', '')
-            groups = parse_markdown_links(markdown_text)
-        else:
-            # Fetch and parse
-            groups = await fetch_and_parse_wiki(wiki_url, current_user.get('mint_session'))
-
-            # Cache the raw response
-            from wiki import fetch_wiki_content
-            content = await fetch_wiki_content(api_url, current_user.get('mint_session'))
-            cache_content(api_url, content)
-
-        return DashboardResponse(
-            groups=groups,
-            last_updated=datetime.now().isoformat()
-        )
+        # Fetch -> cache -> parse, revalidated upstream once the cache expires
+        page = await load_wiki(api_url, current_user.get('mint_session'))
+
+        return dashboard_response(page)
     except HTTPException:
         raise
     except Exception as e:
@@ -97,29 +97,10 @@ async def get_user_dashboard(username: str, current_user: dict = Depends(get_cur
         # Convert to API URL
         api_url = extract_api_url_from_wiki_url(wiki_url)
 
-        # Check cache first
-        cached = get_cached_content(api_url)
-
-        if cached:
-            # Parse cached content
-            import json
-            from wiki import parse_markdown_links
-            wiki_data = json.loads(cached)
-            markdown_text = wiki_data.get('content', '')
-            groups = parse_markdown_links(markdown_text)
-        else:
-            # Fetch and parse
-            groups = await fetch_and_parse_wiki(wiki_url, mint_session)
-
-            # Cache the raw response
-            from wiki import fetch_wiki_content
-            content = await fetch_wiki_content(api_url, mint_session)
-            cache_content(api_url, content)
-
-        return DashboardResponse(
-            groups=groups,
-            last_updated=datetime.now().isoformat()
-        )
+        # Fetch -> cache -> parse, revalidated upstream once the cache expires
+        page = await load_wiki(api_url, mint_session)
+
+        return dashboard_response(page)
     except HTTPException:
         raise
     except Exception as e:
@@ -132,7 +113,10 @@ async def get_user_dashboard(username: str, current_user: dict = Depends(get_cur
 @router.post("/clear-cache")
 async def clear_cache(current_user: dict = Depends(get_current_user)):
     """
-    Clear the wiki content cache
+    Drop the cached copy of the current user's wiki, so the next dashboard
+    load fetches it again. Other users' cache entries are left alone.
     """
-    clear_all_cache()
+    wiki_url = current_user.get('wiki_url')
+    if wiki_url:
+        await invalidate_wiki_url(wiki_url)
     return {"message": "Cache cleared successfully"}
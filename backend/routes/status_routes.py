@@ -2,77 +2,39 @@
 Status monitoring routes
 """
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from datetime import datetime
-from typing import List
-import asyncio
+from typing import AsyncIterator, List
+import json
+import time
 from auth import get_current_user, require_admin
-from database import get_all_users, get_user_session, get_user_by_username
-from wiki import fetch_and_parse_wiki
+from database import get_probe_settings, get_probe_setting, set_probe_setting, delete_probe_setting
+from models import ProbeSettingsRequest
+from link_catalog import collect_all_links, get_all_links_from_gitlab_wikis, get_user_links_from_gitlab_wiki
+from probe_history import get_rollups
+from probe_scheduler import scheduler, probe_links, iter_link_statuses
+from simple_status_check import get_link_target, get_probe_spec, parse_expected_status
 
 router = APIRouter(prefix="/api/status", tags=["status"])
 
+# How long a request waits for the scheduler's first sweep after startup
+FIRST_SWEEP_WAIT_SECONDS = 30
 
-async def get_all_links_from_gitlab_wikis() -> List[dict]:
-    """Get all links from all users' GitLab wikis"""
-    all_links = []
-    users = get_all_users()
+HISTORY_RESOLUTIONS = {"minute": 60, "hour": 3600, "day": 86400}
 
-    for user in users:
-        try:
-            username = user['username']
-            wiki_url = user['wiki_url']
-            mint_session = get_user_session(username)
-
-            # Fetch and parse wiki
-            groups = await fetch_and_parse_wiki(wiki_url, mint_session)
-
-            for group in groups:
-                for link in group.links:
-                    link_data = {
-                        'id': f"{username}_{link.url}",
-                        'name': link.text,
-                        'url': link.url,
-                        'username': username,
-                        'product': group.product,
-                        'environment': group.environment
-                    }
-                    all_links.append(link_data)
-        except Exception as e:
-            continue
-
-    return all_links
-
-
-async def get_user_links_from_gitlab_wiki(username: str) -> List[dict]:
-    """Get links from a specific user's GitLab wiki"""
-    try:
-        # Get user's wiki URL
-        user_data = get_user_by_username(username)
-
-        if not user_data:
-            return []
-
-        wiki_url = user_data[1]
-        mint_session = get_user_session(username)
-
-        # Fetch and parse wiki
-        groups = await fetch_and_parse_wiki(wiki_url, mint_session)
-
-        links = []
-        for group in groups:
-            for link in group.links:
-                link_data = {
-                    'id': f"{username}_{link.url}",
-                    'name': link.text,
-                    'url': link.url,
-                    'product': group.product,
-                    'environment': group.environment
-                }
-                links.append(link_data)
 
-        return links
-    except Exception as e:
-        return []
+def stream_link_statuses(links: List[dict]) -> StreamingResponse:
+    """NDJSON response emitting one status record per line as probes finish"""
+    async def generate() -> AsyncIterator[bytes]:
+        async for record in iter_link_statuses(links, scheduler.uptime):
+            yield (json.dumps(record) + "\n").encode()
+
+    return StreamingResponse(
+        generate(),
+        media_type="application/x-ndjson",
+        # Stop nginx from buffering the stream until it completes
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @router.get("/links")
@@ -81,47 +43,79 @@ async def get_all_link_statuses(current_user: dict = Depends(get_current_user)):
     require_admin(current_user)
 
     try:
-        # Import status check function
-        from simple_status_check import check_link_status
+        # Serve the scheduler snapshot once the first sweep is in
+        if await scheduler.wait_ready(FIRST_SWEEP_WAIT_SECONDS):
+            return {
+                "links": scheduler.links,
+                "failures": scheduler.catalog_failures,
+                "lastSweep": scheduler.last_sweep_at.isoformat()
+            }
+
+        # Scheduler not running - probe inline
+        links, failures = await collect_all_links()
+        link_list = await probe_links(links, scheduler.uptime)
+
+        return {"links": link_list, "failures": failures}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Get all links
-        links = await get_all_links_from_gitlab_wikis()
-
-        # Check status for all links in parallel
-        async def check_single_link(link):
-            try:
-                status_info = await check_link_status(link['url'])
-                result = {
-                    "id": link['id'],
-                    "name": link['name'],
-                    "url": link['url'],
-                    "product": link.get('product', 'Uncategorized'),
-                    "environment": link.get('environment', 'Default'),
-                    "status": status_info['status'],
-                    "responseTime": status_info['response_time'],
-                    "uptime": 100 if status_info['status'] == 'online' else 0,
-                    "lastChecked": datetime.now().isoformat()
-                }
-                return result
-            except Exception as e:
-                return {
-                    "id": link['id'],
-                    "name": link['name'],
-                    "url": link['url'],
-                    "product": link.get('product', 'Uncategorized'),
-                    "environment": link.get('environment', 'Default'),
-                    "status": "unknown",
-                    "responseTime": 0,
-                    "uptime": 0,
-                    "lastChecked": datetime.now().isoformat()
-                }
 
-        # Run all checks in parallel
-        link_list = await asyncio.gather(*[check_single_link(link) for link in links])
+@router.get("/stream")
+async def stream_all_link_statuses(current_user: dict = Depends(get_current_user)):
+    """Live-probe all links and stream results as NDJSON (admin only)"""
+    require_admin(current_user)
+
+    links = await get_all_links_from_gitlab_wikis()
+    return stream_link_statuses(links)
+
+
+@router.get("/stream/{username}")
+async def stream_user_link_statuses(
+    username: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Live-probe a specific user's links and stream results as NDJSON"""
+    if current_user['username'] != username and not current_user.get("is_admin"):
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    user_links = await get_user_links_from_gitlab_wiki(username)
+    return stream_link_statuses(user_links)
+
+
+@router.get("/scheduler")
+async def get_scheduler_stats(current_user: dict = Depends(get_current_user)):
+    """Probe scheduler and dispatcher state, including backpressure (admin only)"""
+    require_admin(current_user)
+    return scheduler.stats()
 
-        return {"links": list(link_list)}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/history")
+async def get_link_history(
+    url: str,
+    resolution: str = "hour",
+    days: int = 7,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get uptime and response time rollups for a link URL"""
+    if resolution not in HISTORY_RESOLUTIONS:
+        raise HTTPException(status_code=400, detail="Resolution must be minute, hour or day")
+
+    # Non-admins can only see history for their own links
+    if not current_user.get("is_admin"):
+        own_links = scheduler.get_user_links(current_user['username']) or []
+        if not any(link['url'] == url for link in own_links):
+            raise HTTPException(status_code=403, detail="Not authorized")
+
+    # History is stored per probe target, shared by every link on it
+    target = get_link_target(url, get_probe_spec(url, get_probe_setting(url))) or url
+    since = int(time.time()) - days * 86400
+    return {
+        "url": url,
+        "target": target,
+        "resolution": resolution,
+        "uptime": scheduler.uptime.get(target),
+        "buckets": get_rollups(target, HISTORY_RESOLUTIONS[resolution], since)
+    }
 
 
 @router.get("/links/{username}")
@@ -135,45 +129,19 @@ async def get_user_link_statuses(
         raise HTTPException(status_code=403, detail="Not authorized")
 
     try:
-        # Import status check function
-        from simple_status_check import check_link_status
-
-        # Get user's links
-        user_links = await get_user_links_from_gitlab_wiki(username)
-
-        # Check status for all links in parallel
-        async def check_single_link(link):
-            try:
-                status_info = await check_link_status(link['url'])
-                result = {
-                    "id": link['id'],
-                    "name": link['name'],
-                    "url": link['url'],
-                    "product": link.get('product', 'Uncategorized'),
-                    "environment": link.get('environment', 'Default'),
-                    "status": status_info['status'],
-                    "responseTime": status_info['response_time'],
-                    "uptime": 100 if status_info['status'] == 'online' else 0,
-                    "lastChecked": datetime.now().isoformat()
-                }
-                return result
-            except Exception as e:
+        if await scheduler.wait_ready(FIRST_SWEEP_WAIT_SECONDS):
+            user_statuses = scheduler.get_user_links(username)
+            if user_statuses is not None:
                 return {
-                    "id": link['id'],
-                    "name": link['name'],
-                    "url": link['url'],
-                    "product": link.get('product', 'Uncategorized'),
-                    "environment": link.get('environment', 'Default'),
-                    "status": "unknown",
-                    "responseTime": 0,
-                    "uptime": 0,
-                    "lastChecked": datetime.now().isoformat()
+                    "links": user_statuses,
+                    "lastSweep": scheduler.last_sweep_at.isoformat()
                 }
 
-        # Run all checks in parallel
-        link_list = await asyncio.gather(*[check_single_link(link) for link in user_links])
+        # User not covered by the snapshot yet (e.g. just registered)
+        user_links = await get_user_links_from_gitlab_wiki(username)
+        link_list = await probe_links(user_links, scheduler.uptime)
 
-        return {"links": list(link_list)}
+        return {"links": link_list}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -195,8 +163,9 @@ async def ping_link(
 
         link_url = parts[1]
 
-        # Check status
-        status_info = await check_link_status(link_url)
+        # Check status the same way the scheduler does for this link
+        spec = get_probe_spec(link_url, get_probe_setting(link_url))
+        status_info = await check_link_status(link_url, spec=spec)
 
         return {
             "id": link_id,
@@ -208,3 +177,57 @@ async def ping_link(
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/probe-settings")
+async def list_probe_settings(current_user: dict = Depends(get_current_user)):
+    """List per-link probe settings (admin only)"""
+    require_admin(current_user)
+    return {"settings": list(get_probe_settings().values())}
+
+
+@router.put("/probe-settings")
+async def update_probe_settings(
+    request: ProbeSettingsRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Set how a link URL is probed (admin only)"""
+    require_admin(current_user)
+
+    if request.mode not in ("tcp", "http"):
+        raise HTTPException(status_code=400, detail="Mode must be tcp or http")
+    if request.method and request.method.upper() not in ("HEAD", "GET"):
+        raise HTTPException(status_code=400, detail="Method must be HEAD or GET")
+    if request.expected_status:
+        try:
+            valid = bool(parse_expected_status(request.expected_status))
+        except ValueError:
+            valid = False
+        if not valid:
+            raise HTTPException(status_code=400, detail="Invalid expected status format")
+
+    set_probe_setting(
+        url=request.url,
+        mode=request.mode,
+        method=request.method.upper() if request.method else None,
+        expected_status=request.expected_status,
+        body_match=request.body_match
+    )
+    scheduler.invalidate_catalog()
+
+    return {
+        "message": "Probe settings updated",
+        "probe": get_probe_spec(request.url, get_probe_setting(request.url))
+    }
+
+
+@router.delete("/probe-settings")
+async def remove_probe_settings(url: str, current_user: dict = Depends(get_current_user)):
+    """Reset a link URL to the default probe mode (admin only)"""
+    require_admin(current_user)
+
+    if not delete_probe_setting(url):
+        raise HTTPException(status_code=404, detail="No probe settings for this URL")
+    scheduler.invalidate_catalog()
+
+    return {"message": "Probe settings removed"}
@@ -0,0 +1,92 @@
+"""
+Webhook routes - GitLab wiki page events invalidate the wiki cache
+"""
+from fastapi import APIRouter, HTTPException, Header, Request
+from typing import Optional
+import secrets
+import urllib.parse
+import logging
+from config import GITLAB_WEBHOOK_SECRET
+from database import get_user_session
+from cache import invalidate_cache
+from cache_invalidation import affected_users
+from wiki import extract_api_url_from_wiki_url, extract_project_wikis_url, schedule_wiki_refresh
+from probe_scheduler import scheduler
+
+router = APIRouter(prefix="/api/webhooks", tags=["webhooks"])
+logger = logging.getLogger(__name__)
+
+
+@router.post("/gitlab")
+async def gitlab_webhook(
+    request: Request,
+    x_gitlab_token: Optional[str] = Header(None),
+    x_gitlab_event: Optional[str] = Header(None)
+):
+    """
+    Receive GitLab Wiki Page Hook events: drop the cached copies of the
+    changed page and its project's page list, refresh them in the
+    background and have the link catalog re-read
+    """
+    if not GITLAB_WEBHOOK_SECRET:
+        raise HTTPException(status_code=503, detail="GitLab webhook is not configured")
+    if not x_gitlab_token or not secrets.compare_digest(x_gitlab_token, GITLAB_WEBHOOK_SECRET):
+        raise HTTPException(status_code=403, detail="Invalid webhook token")
+
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Payload must be a JSON object")
+
+    if x_gitlab_event != "Wiki Page Hook" or payload.get('object_kind') != "wiki_page":
+        return {"status": "ignored", "event": x_gitlab_event}
+
+    project = payload.get('project')
+    page = payload.get('object_attributes')
+    if not isinstance(project, dict) or not isinstance(page, dict):
+        raise HTTPException(status_code=400, detail="Payload has no project or page attributes")
+
+    project_path = str(project.get('path_with_namespace') or '').lower()
+    slug = urllib.parse.unquote(str(page.get('slug') or '')).lower()
+    action = page.get('action')
+
+    if not project_path or not slug:
+        raise HTTPException(status_code=400, detail="Payload has no project or page slug")
+
+    # Match on project path and slug - GitLab's external URL may differ from the users' wiki URLs
+    users = affected_users(project_path, slug)
+    urls = set()
+    refreshes = {}
+    for user in users:
+        urls.add(extract_project_wikis_url(user['wiki_url']))
+        if user['page_changed']:
+            api_url = extract_api_url_from_wiki_url(user['wiki_url'])
+            urls.add(api_url)
+            refreshes.setdefault(api_url, user['username'])
+
+    removed = await invalidate_cache(sorted(urls))
+
+    # Re-fetch the changed page now so the next dashboard hit is served from the cache
+    if action != "delete":
+        for api_url, username in refreshes.items():
+            schedule_wiki_refresh(api_url, get_user_session(username))
+
+    if users:
+        scheduler.invalidate_catalog()
+
+    logger.info(
+        f"Wiki page {project_path}/{slug} {action}: "
+        f"{removed} cache entries dropped for {len(users)} users"
+    )
+
+    return {
+        "status": "ok",
+        "project": project_path,
+        "slug": slug,
+        "action": action,
+        "users": [user['username'] for user in users if user['page_changed']],
+        "invalidated": sorted(urls)
+    }
@@ -1,10 +1,90 @@
-# Simple Status Check - Ping and Telnet only
-# Replace the complex httpx implementation with this simpler version
+# Simple Status Check - Ping and Telnet, with an optional HTTP mode
+# Telnet-style TCP checks are the default; HTTP checks are opt-in per link or globally
 
+import asyncio
 import subprocess
 import socket
+import time
 from urllib.parse import urlparse
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
+import httpx
+from config import (
+    PROBE_TIMEOUT_SECONDS,
+    PROBE_MODE,
+    HTTP_PROBE_METHOD,
+    HTTP_PROBE_EXPECTED_STATUS,
+    HTTP_PROBE_MAX_CONNECTIONS,
+    HTTP_PROBE_MAX_KEEPALIVE,
+    HTTP_PROBE_KEEPALIVE_SECONDS,
+    HTTP_PROBE_VERIFY_TLS,
+)
+from dns_cache import dns_cache
+from http_client import HTTP2_AVAILABLE
+from probe_dispatcher import probe_limiter
+
+
+def get_probe_target(url: str) -> Tuple[str, int]:
+    """
+    Extract the (hostname, port) pair a TCP probe connects to
+    """
+    parsed = urlparse(url)
+    hostname = parsed.hostname or parsed.netloc.split(':')[0]
+
+    # Determine port based on scheme
+    if parsed.port:
+        port = parsed.port
+    elif parsed.scheme == 'https':
+        port = 443
+    elif parsed.scheme == 'http':
+        port = 80
+    else:
+        port = 80
+
+    return hostname, port
+
+
+def get_probe_spec(url: str, settings: Optional[dict] = None) -> dict:
+    """
+    Resolve how a link is probed from its stored settings and the global default
+    """
+    settings = settings or {}
+    mode = settings.get('mode') or PROBE_MODE
+    if mode != 'http':
+        return {"mode": "tcp"}
+
+    body_match = settings.get('body_match')
+    method = (settings.get('method') or HTTP_PROBE_METHOD).upper()
+    if body_match:
+        # HEAD responses have no body to match against
+        method = 'GET'
+
+    return {
+        "mode": "http",
+        "method": method,
+        "expected_status": settings.get('expected_status') or HTTP_PROBE_EXPECTED_STATUS,
+        "body_match": body_match
+    }
+
+
+def get_link_target(url: str, spec: Optional[dict] = None) -> Optional[str]:
+    """
+    Key identifying what a probe of this URL actually checks
+    TCP probes are keyed by "host:port", HTTP probes by the full request
+    Links that share a key share one probe
+    """
+    if spec and spec['mode'] == 'http':
+        return f"{spec['method']} {url}"
+
+    try:
+        hostname, port = get_probe_target(url)
+    except Exception:
+        return None
+    if not hostname:
+        return None
+    if ':' in hostname:
+        hostname = f"[{hostname}]"
+    return f"{hostname.lower()}:{port}"
+
 
 def simple_check_link_status(url: str) -> Dict:
     """
@@ -13,25 +93,13 @@ def simple_check_link_status(url: str) -> Dict:
     """
     try:
         # Parse URL to get hostname and port
-        parsed = urlparse(url)
-        hostname = parsed.hostname or parsed.netloc.split(':')[0]
-
-        # Determine port based on scheme
-        if parsed.port:
-            port = parsed.port
-        elif parsed.scheme == 'https':
-            port = 443
-        elif parsed.scheme == 'http':
-            port = 80
-        else:
-            port = 80
+        hostname, port = get_probe_target(url)
 
         # Try telnet first (faster and more reliable for web servers)
         try:
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(2)  # 2 second timeout (reduced from 5)
+            sock.settimeout(PROBE_TIMEOUT_SECONDS)
 
-            import time
             start_time = time.time()
             result = sock.connect_ex((hostname, port))
             end_time = time.time()
@@ -58,7 +126,7 @@ def simple_check_link_status(url: str) -> Dict:
         except socket.timeout:
             return {
                 "status": "offline",
-                "response_time": 2000,
+                "response_time": int(PROBE_TIMEOUT_SECONDS * 1000),
                 "method": "telnet",
                 "error": "Connection timeout"
             }
@@ -90,7 +158,6 @@ def try_ping(hostname: str) -> Dict:
         param = '-n' if platform.system().lower() == 'windows' else '-c'
         command = ['ping', param, '1', '-w', '3000', hostname]
 
-        import time
         start_time = time.time()
 
         result = subprocess.run(
@@ -133,21 +200,218 @@ def try_ping(hostname: str) -> Dict:
         }
 
 
-# Async wrapper for FastAPI
-async def check_link_status(url: str) -> Dict:
+# Async probe engine
+# Every probe holds a slot from probe_limiter (global and per-host caps)
+async def _tcp_connect(address_info: tuple):
+    """Open and immediately close a non-blocking TCP connection"""
+    loop = asyncio.get_running_loop()
+    family, sock_type, proto, _, address = address_info
+
+    sock = socket.socket(family, sock_type, proto)
+    sock.setblocking(False)
+    try:
+        await loop.sock_connect(sock, address)
+    finally:
+        sock.close()
+
+
+async def _tcp_connect_any(infos: List[tuple]):
+    """
+    Connect to each resolved address in turn until one accepts, IPv4
+    first - a host with an unreachable AAAA record is still reachable
+    """
+    last_error = None
+    for address_info in sorted(infos, key=lambda info: info[0] != socket.AF_INET):
+        try:
+            return await _tcp_connect(address_info)
+        except OSError as e:
+            last_error = e
+    raise last_error
+
+
+async def async_check_tcp_status(hostname: str, port: int,
+                                 timeout: float = PROBE_TIMEOUT_SECONDS) -> Dict:
+    """
+    Telnet-style check on the event loop; only name resolution runs on
+    the DNS cache's resolver threads
+    Returns the same shape as simple_check_link_status plus dns_time, the
+    name resolution time in ms, which is not part of response_time
+    """
+    async with probe_limiter.slot(hostname):
+        # The timeout window only starts once a probe slot is free
+        start_time = time.monotonic()
+        try:
+            infos = await dns_cache.resolve(hostname, port, timeout)
+        except asyncio.TimeoutError:
+            return {
+                "status": "offline",
+                "response_time": 0,
+                "dns_time": int(timeout * 1000),
+                "method": "telnet",
+                "error": "DNS timeout"
+            }
+        except Exception as e:
+            return {
+                "status": "offline",
+                "response_time": 0,
+                "dns_time": int((time.monotonic() - start_time) * 1000),
+                "method": "telnet",
+                "error": str(e)
+            }
+
+        connect_start = time.monotonic()
+        dns_time = int((connect_start - start_time) * 1000)
+        try:
+            await asyncio.wait_for(_tcp_connect_any(infos), timeout)
+            return {
+                "status": "online",
+                "response_time": int((time.monotonic() - connect_start) * 1000),
+                "dns_time": dns_time,
+                "method": "telnet"
+            }
+        except asyncio.TimeoutError:
+            return {
+                "status": "offline",
+                "response_time": int(timeout * 1000),
+                "dns_time": dns_time,
+                "method": "telnet",
+                "error": "Connection timeout"
+            }
+        except ConnectionRefusedError:
+            return {
+                "status": "offline",
+                "response_time": int((time.monotonic() - connect_start) * 1000),
+                "dns_time": dns_time,
+                "method": "telnet",
+                "error": "Connection refused"
+            }
+        except Exception as e:
+            return {
+                "status": "offline",
+                "response_time": 0,
+                "dns_time": dns_time,
+                "method": "telnet",
+                "error": str(e)
+            }
+
+
+# Shared client for HTTP probes - keep-alive connections are reused across sweeps
+_probe_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_probe_http_client() -> httpx.AsyncClient:
+    global _probe_http_client
+    if _probe_http_client is None:
+        _probe_http_client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            verify=HTTP_PROBE_VERIFY_TLS,
+            follow_redirects=False,
+            limits=httpx.Limits(
+                max_connections=HTTP_PROBE_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_PROBE_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_PROBE_KEEPALIVE_SECONDS
+            ),
+            headers={'User-Agent': 'Synks-StatusProbe/1.0'}
+        )
+    return _probe_http_client
+
+
+async def close_probe_http_client():
+    global _probe_http_client
+    if _probe_http_client is not None:
+        await _probe_http_client.aclose()
+        _probe_http_client = None
+
+
+def parse_expected_status(expected: str) -> List[Tuple[int, int]]:
     """
-    Async wrapper for the simple status check
-    FastAPI uses async, so we wrap the sync function
+    Parse "200", "200-399" or "200,204,301-302" into inclusive ranges
+    Raises ValueError if any part is not a status code (100-599) or an
+    ascending range of them
     """
-    import asyncio
-    return await asyncio.to_thread(simple_check_link_status, url)
+    ranges = []
+    for part in expected.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            low, high = part.split('-', 1)
+            low, high = int(low), int(high)
+        else:
+            low = high = int(part)
+        if not 100 <= low <= high <= 599:
+            raise ValueError(f"Invalid status code range: {part}")
+        ranges.append((low, high))
+    return ranges
+
+
+def status_matches(status_code: int, expected: str) -> bool:
+    """Match a status code against "200", "200-399" or "200,204,301-302" """
+    return any(low <= status_code <= high for low, high in parse_expected_status(expected))
 
 
-# ============================================
-# Usage example in your analytics_endpoints.py
-# ============================================
-# Replace the existing check_link_status function with:
-#
-# from simple_status_check import check_link_status
-#
-# That's it! Now status checks use simple ping/telnet
+async def check_http_status(url: str, spec: dict, timeout: float = PROBE_TIMEOUT_SECONDS) -> Dict:
+    """
+    HTTP health check through the shared pooled client
+    Healthy means the status code is expected and, if set, the body contains body_match
+    """
+    client = get_probe_http_client()
+    async with probe_limiter.slot(urlparse(url).hostname):
+        start_time = time.monotonic()
+        try:
+            response = await client.request(spec['method'], url, timeout=timeout)
+            response_time = int((time.monotonic() - start_time) * 1000)
+
+            if not status_matches(response.status_code, spec['expected_status']):
+                error = f"HTTP {response.status_code}"
+            elif spec.get('body_match') and spec['body_match'] not in response.text:
+                error = "Body match failed"
+            else:
+                error = None
+
+            result = {
+                "status": "online" if error is None else "offline",
+                "response_time": response_time,
+                "method": "http",
+                "http_status": response.status_code,
+                "http_version": response.http_version
+            }
+            if error:
+                result["error"] = error
+            return result
+        except httpx.TimeoutException:
+            return {
+                "status": "offline",
+                "response_time": int(timeout * 1000),
+                "method": "http",
+                "error": "Request timeout"
+            }
+        except Exception as e:
+            return {
+                "status": "offline",
+                "response_time": int((time.monotonic() - start_time) * 1000),
+                "method": "http",
+                "error": str(e) or e.__class__.__name__
+            }
+
+
+async def check_link_status(url: str, timeout: float = PROBE_TIMEOUT_SECONDS,
+                            spec: Optional[dict] = None) -> Dict:
+    """
+    Async status check for a link URL
+    spec comes from get_probe_spec; without one the link gets a TCP check
+    """
+    if spec and spec['mode'] == 'http':
+        return await check_http_status(url, spec, timeout)
+
+    try:
+        hostname, port = get_probe_target(url)
+    except Exception as e:
+        return {
+            "status": "offline",
+            "response_time": 0,
+            "method": "error",
+            "error": str(e)
+        }
+
+    return await async_check_tcp_status(hostname, port, timeout)
@@ -0,0 +1,7 @@
+"""
+Backend modules are imported the way main.py imports them, from backend/
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,106 @@
+"""
+TargetState: adaptive probe intervals and confirming outages across ticks
+"""
+from config import (
+    PROBE_INTERVAL_SECONDS,
+    PROBE_MIN_INTERVAL_SECONDS,
+    PROBE_MAX_INTERVAL_SECONDS,
+    PROBE_SCHEDULE_JITTER,
+    PROBE_OFFLINE_CONFIRM_RETRIES,
+    PROBE_OFFLINE_CONFIRM_DELAY_SECONDS,
+)
+from probe_scheduler import TargetState
+
+
+def result(status: str) -> dict:
+    return {"status": status, "response_time": 1, "method": "tcp"}
+
+
+def probe(state: TargetState, status: str, now: float):
+    """What probe_due does with one result: hold unconfirmed outages, else apply"""
+    status_info = result(status)
+    if state.hold_offline(status_info, now):
+        return None
+    return state.update(status_info, now)
+
+
+def assert_due_after(state: TargetState, now: float, interval: float):
+    assert interval * (1 - PROBE_SCHEDULE_JITTER) <= state.next_due - now <= interval * (1 + PROBE_SCHEDULE_JITTER)
+
+
+def test_stable_online_target_backs_off_to_the_ceiling():
+    state = TargetState("http://a")
+    assert probe(state, "online", 0) is False
+    assert state.interval == PROBE_INTERVAL_SECONDS
+
+    intervals = []
+    for tick in range(1, 12):
+        probe(state, "online", tick)
+        intervals.append(state.interval)
+    assert intervals == sorted(intervals)
+    assert intervals[0] > PROBE_INTERVAL_SECONDS
+    assert intervals[-1] == PROBE_MAX_INTERVAL_SECONDS
+    assert_due_after(state, 11, PROBE_MAX_INTERVAL_SECONDS)
+
+
+def test_offline_target_backs_off_only_to_the_base_interval():
+    state = TargetState("http://a")
+    for tick in range(6):
+        probe(state, "offline", tick)
+    assert state.interval == PROBE_INTERVAL_SECONDS
+    assert not state.online
+
+
+def test_first_probe_offline_is_applied_without_confirmation():
+    state = TargetState("http://a")
+    assert probe(state, "offline", 0) is False
+    assert state.status_info["status"] == "offline"
+    assert state.unconfirmed == 0
+
+
+def test_online_target_goes_offline_only_after_confirmation():
+    state = TargetState("http://a")
+    probe(state, "online", 0)
+    probe(state, "online", 100)
+    backed_off = state.interval
+
+    now = 200
+    for attempt in range(PROBE_OFFLINE_CONFIRM_RETRIES):
+        assert probe(state, "offline", now) is None
+        # Still reported online, and re-probed after the short confirmation delay
+        assert state.online
+        assert state.next_due == now + PROBE_OFFLINE_CONFIRM_DELAY_SECONDS
+        assert state.interval == backed_off
+        now = state.next_due
+
+    status_info = result("offline")
+    assert state.hold_offline(status_info, now) is False
+    assert state.update(status_info, now) is True
+    assert status_info["attempts"] == PROBE_OFFLINE_CONFIRM_RETRIES + 1
+    assert not state.online
+    assert state.changes == 1
+    assert state.interval == PROBE_MIN_INTERVAL_SECONDS
+    assert state.unconfirmed == 0
+
+
+def test_recovery_during_confirmation_is_not_an_outage():
+    state = TargetState("http://a")
+    probe(state, "online", 0)
+    assert probe(state, "offline", 10) is None
+    assert state.unconfirmed == 1
+
+    assert probe(state, "online", 11) is False
+    assert state.changes == 0
+    assert state.unconfirmed == 0
+
+    # The next failure starts counting from scratch
+    assert probe(state, "offline", 200) is None
+    assert state.unconfirmed == 1
+
+
+def test_recovery_from_offline_is_applied_at_once():
+    state = TargetState("http://a")
+    probe(state, "offline", 0)
+    assert probe(state, "online", 60) is True
+    assert state.online
+    assert state.interval == PROBE_MIN_INTERVAL_SECONDS
@@ -0,0 +1,108 @@
+"""
+Wiki fetch pipeline against a fake GitLab: request coalescing,
+stale-while-revalidate and conditional revalidation
+"""
+import asyncio
+import json
+from datetime import datetime, timedelta
+import pytest
+import cache
+import wiki
+from cache_backends import MemoryCacheBackend
+from config import CACHE_EXPIRY_MINUTES
+
+PAGE_URL = "http://gitlab/api/v4/projects/group%2Fp/wikis/Links"
+LIST_URL = "http://gitlab/api/v4/projects/group%2Fp/wikis?with_content=1"
+MARKDOWN = "# Product\n## Prod\n* [App](http://app)\n"
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, text: str = "", etag: str = None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = {"etag": etag} if etag else {}
+
+
+class FakeGitLab:
+    """Serves one body per URL with an ETag, answering 304 when it matches"""
+
+    def __init__(self, bodies):
+        self.bodies = bodies
+        self.requests = []
+
+    async def __call__(self, url, session_cookie=None, extra_headers=None):
+        self.requests.append((url, dict(extra_headers or {})))
+        await asyncio.sleep(0.01)
+        body = self.bodies[url]
+        etag = f'"{wiki.hash_content(body)[:8]}"'
+        if (extra_headers or {}).get("If-None-Match") == etag:
+            return FakeResponse(304, etag=etag)
+        return FakeResponse(200, body, etag)
+
+
+@pytest.fixture
+def gitlab(monkeypatch):
+    monkeypatch.setattr(cache, "backend", MemoryCacheBackend())
+    cache.memory_tier.clear()
+    fake = FakeGitLab({
+        PAGE_URL: json.dumps({"content": MARKDOWN}),
+        LIST_URL: json.dumps([{"slug": "Links", "content": MARKDOWN}]),
+    })
+    monkeypatch.setattr(wiki, "request_wiki", fake)
+    yield fake
+    cache.memory_tier.clear()
+
+
+async def expire_cache():
+    """Age every entry to just past expiry, within the stale grace period"""
+    cache.memory_tier.clear()
+    await cache.backend.expire(datetime.now() - timedelta(minutes=CACHE_EXPIRY_MINUTES, seconds=1))
+
+
+async def settle():
+    await asyncio.gather(*wiki._refresh_tasks)
+
+
+def test_concurrent_loads_share_one_upstream_request(gitlab):
+    async def run():
+        return await asyncio.gather(*(wiki.load_wiki(PAGE_URL) for _ in range(10)))
+
+    pages = asyncio.run(run())
+    assert len(gitlab.requests) == 1
+    assert {page.groups[0].product for page in pages} == {"Product"}
+
+
+def test_stale_entry_is_served_and_revalidated_with_a_conditional_request(gitlab):
+    async def run():
+        first = await wiki.load_wiki(PAGE_URL)
+        await expire_cache()
+        stale = await wiki.load_wiki(PAGE_URL)
+        await settle()
+        entry = await cache.get_cache_entry(PAGE_URL)
+        return first, stale, entry
+
+    first, stale, entry = asyncio.run(run())
+    assert first.source == "fetched"
+    assert stale.stale
+    assert [group.model_dump() for group in stale.groups] == [group.model_dump() for group in first.groups]
+
+    assert len(gitlab.requests) == 2
+    assert gitlab.requests[1][1]["If-None-Match"] == first.etag
+    # The 304 renewed the entry and kept its parsed groups
+    assert entry["fresh"]
+    assert entry["groups_json"] == first.groups_json
+
+
+def test_stale_project_list_refresh_does_not_parse_it_as_a_page(gitlab):
+    async def run():
+        await wiki.load_project_wikis(LIST_URL)
+        await expire_cache()
+        gitlab.bodies[LIST_URL] = json.dumps([{"slug": "Links", "content": MARKDOWN + "* [New](http://new)\n"}])
+        stale = await wiki.load_project_wikis(LIST_URL)
+        await settle()
+        refreshed = await wiki.load_project_wikis(LIST_URL)
+        return stale, refreshed
+
+    stale, refreshed = asyncio.run(run())
+    assert [link.text for link in stale.groups("http://gitlab/group/p/-/wikis/Links")[0].links] == ["App"]
+    assert [link.text for link in refreshed.groups("http://gitlab/group/p/-/wikis/Links")[0].links] == ["App", "New"]
@@ -0,0 +1,94 @@
+"""
+The single-pass parser and the serialized groups the dashboard cache
+stores must give the same groups as the legacy line-splitting parser
+"""
+import asyncio
+import json
+import pytest
+import wiki
+from bench_wiki_parser import legacy_parse_markdown_links, synthetic_wiki
+from wiki import WikiPage, iter_link_groups, parse_markdown_links, serialize_link_groups
+
+EDGE_CASES = [
+    "",
+    "no headers at all\n* [A](http://a)\n",
+    "# Product\n## Env\n* [A](http://a)\n* [B](http://b)\n",
+    # Links before an environment carry over to the next complete group
+    "# Product\n* [Early](http://early)\n## Env\n* [A](http://a)\n",
+    # A product header keeps the environment
+    "# One\n## Prod\n* [A](http://a)\n# Two\n* [B](http://b)\n",
+    # Empty environments and products without links are dropped
+    "# P\n## Empty\n## Full\n* [A](http://a)\n# Lonely\n",
+    # Indented bullets, several links per line, prose and tables
+    "# P\n## E\n  * [A](http://a) and [B](http://b)\ntext [C](http://c)\n| [D](http://d) |\n- [E](http://e)\n",
+    # Headers need the space; trailing spaces are trimmed
+    "#NoSpace\n# P  \n##NoSpace\n## E  \n* [A](http://a)\n",
+    "# P\r\n## E\r\n* [A](http://a)\r\n",
+]
+
+
+def legacy_groups(content: str):
+    return [group.model_dump() for group in legacy_parse_markdown_links(content)]
+
+
+@pytest.mark.parametrize("content", EDGE_CASES)
+def test_parse_matches_legacy_on_edge_cases(content):
+    assert [group.model_dump() for group in parse_markdown_links(content)] == legacy_groups(content)
+
+
+@pytest.mark.parametrize("size,seed", [(1024, 0), (64 * 1024, 1), (256 * 1024, 2)])
+def test_parse_matches_legacy_on_synthetic_wikis(size, seed):
+    content = synthetic_wiki(size, seed)
+    expected = legacy_groups(content)
+    assert expected
+    assert [group.model_dump() for group in parse_markdown_links(content)] == expected
+
+
+@pytest.mark.parametrize("content", EDGE_CASES + [synthetic_wiki(64 * 1024, 3)])
+def test_serialized_groups_match_legacy(content):
+    assert json.loads(serialize_link_groups(iter_link_groups(content))) == legacy_groups(content)
+
+
+def test_cached_page_groups_match_legacy(monkeypatch):
+    """A page parsed through the cache path serves the legacy groups"""
+    markdown = synthetic_wiki(16 * 1024, 4)
+    stored = {}
+
+    async def cache_parsed(url, content_hash, groups_json):
+        stored[content_hash] = groups_json
+
+    monkeypatch.setattr(wiki, "cache_parsed", cache_parsed)
+    content = json.dumps({"content": markdown})
+    page = WikiPage("http://gitlab/api/v4/projects/p/wikis/Links", {
+        "cached_at": None,
+        "etag": None,
+        "last_modified": None,
+        "content_hash": wiki.hash_content(content),
+        "source": "fetched",
+        "content": content,
+        "groups_json": None,
+    })
+    asyncio.run(page.parse())
+
+    assert stored == {page.content_hash: page.groups_json}
+    assert [group.model_dump() for group in page.groups] == legacy_groups(markdown)
+
+    # A later hit built from the stored groups alone gives the same models
+    cached = WikiPage(page.api_url, {
+        "cached_at": None,
+        "etag": None,
+        "last_modified": None,
+        "content_hash": page.content_hash,
+        "source": "cache",
+        "content": None,
+        "groups_json": stored[page.content_hash],
+    })
+    asyncio.run(cached.parse())
+    assert [group.model_dump() for group in cached.groups] == legacy_groups(markdown)
+
+
+def test_wiki_markdown_rejects_non_object_json():
+    with pytest.raises(wiki.HTTPException):
+        wiki.wiki_markdown("[1, 2]")
+    with pytest.raises(wiki.HTTPException):
+        wiki.wiki_markdown("not json")
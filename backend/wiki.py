@@ -2,143 +2,211 @@
 Wiki content fetching and parsing functionality
 """
 from fastapi import HTTPException
-import httpx
 import re
 import json
+import asyncio
+import io
+import logging
 import urllib.parse
-from typing import List
-from models import ProductGroup, LinkItem
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from models import ProductGroup
+from http_client import get_http_client, cookie_header
+from cache import (
+    get_cache_entry, read_cached_content, cache_content, cache_parsed, touch_cache, hash_content
+)
+from singleflight import SingleFlight
+from config import CACHE_EXPIRY_MINUTES, CACHE_STALE_GRACE_MINUTES, CACHE_MAX_STALENESS_MINUTES
 
+logger = logging.getLogger(__name__)
 
-async def fetch_wiki_content(wiki_url: str, session_cookie: str = None) -> str:
+
+async def request_wiki(wiki_url: str, session_cookie: str = None, extra_headers: dict = None):
     """
-    Fetch wiki page content with authentication
+    Send an authenticated wiki request, returning a 200 or 304 response
     """
     try:
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
+        if extra_headers:
+            headers.update(extra_headers)
 
-        cookies_dict = {}
-        if session_cookie:
-            # Parse cookie string into dict
-            if ';' in session_cookie:
-                for cookie in session_cookie.split(';'):
-                    cookie = cookie.strip()
-                    if '=' in cookie:
-                        key, value = cookie.split('=', 1)
-                        cookies_dict[key.strip()] = value.strip()
-            else:
-                cookies_dict['_gitlab_session'] = session_cookie
-
-        async with httpx.AsyncClient(follow_redirects=True, timeout=30.0) as client:
-            response = await client.get(
-                wiki_url,
-                cookies=cookies_dict,
-                headers=headers
-            )
+        # Cookies go on the request - the shared client keeps none
+        cookie = cookie_header(session_cookie)
+        if cookie:
+            headers['Cookie'] = cookie
 
-            if response.status_code == 200:
-                # Check if we got redirected to login page
-                if 'sign_in' in str(response.url) or 'You need to sign in' in response.text:
-                    raise HTTPException(
-                        status_code=401,
-                        detail="Session expired. Please login again."
-                    )
+        response = await get_http_client().get(wiki_url, headers=headers)
 
-                return response.text
-            else:
+        if response.status_code == 304:
+            return response
+        elif response.status_code == 200:
+            # Check if we got redirected to login page
+            if 'sign_in' in str(response.url) or 'You need to sign in' in response.text:
                 raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"Failed to fetch wiki: HTTP {response.status_code}"
+                    status_code=401,
+                    detail="Session expired. Please login again."
                 )
+
+            return response
+        else:
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=f"Failed to fetch wiki: HTTP {response.status_code}"
+            )
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching wiki: {str(e)}")
 
 
+async def fetch_wiki_content(wiki_url: str, session_cookie: str = None) -> str:
+    """
+    Fetch wiki page content with authentication
+    """
+    response = await request_wiki(wiki_url, session_cookie)
+    return response.text
+
+
+async def revalidate_wiki_entry(api_url: str, session_cookie: str = None, entry: Optional[Dict] = None) -> Dict:
+    """
+    Refresh a wiki's cache entry upstream with one request - a conditional
+    one when there is a cached copy. Returns the new entry with a 'source'
+    of 'revalidated' (unchanged) or 'fetched'.
+    """
+    headers = {}
+    if entry:
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+
+    response = await request_wiki(api_url, session_cookie, headers)
+    etag = response.headers.get('etag')
+    last_modified = response.headers.get('last-modified')
+
+    if entry and (response.status_code == 304 or hash_content(response.text) == entry['content_hash']):
+        # Unchanged upstream - a 304, or an identical body when there are no validators
+        return dict(
+            entry,
+            cached_at=await touch_cache(api_url, etag, last_modified),
+            etag=etag or entry['etag'],
+            last_modified=last_modified or entry['last_modified'],
+            age_seconds=0,
+            fresh=True,
+            source='revalidated'
+        )
+
+    content = response.text
+    return {
+        "content": content,
+        "cached_at": await cache_content(api_url, content, etag, last_modified),
+        "etag": etag,
+        "last_modified": last_modified,
+        "content_hash": hash_content(content),
+        "groups_json": None,
+        "age_seconds": 0,
+        "fresh": True,
+        "source": 'fetched'
+    }
+
+
+async def fetch_wiki_entry(api_url: str, session_cookie: str = None, parse_page: bool = True) -> Dict:
+    """
+    Get a wiki API response through the cache (stale-while-revalidate).
+
+    Fresh entries are served as is. Within CACHE_STALE_GRACE_MINUTES past
+    expiry the stale entry is served right away ('stale') and refreshed in
+    the background. Older entries are revalidated inline, and are only
+    served stale when Mint fails and they are within
+    CACHE_MAX_STALENESS_MINUTES. parse_page is False for responses that are
+    not a single wiki page (project wiki lists), so their background
+    refresh does not parse them as one.
+    """
+    entry = await get_cache_entry(api_url)
+    if entry and entry['fresh']:
+        return dict(entry, source='cache')
+
+    max_staleness = CACHE_MAX_STALENESS_MINUTES * 60
+    if entry and entry['age_seconds'] <= min((CACHE_EXPIRY_MINUTES + CACHE_STALE_GRACE_MINUTES) * 60, max_staleness):
+        schedule_wiki_refresh(api_url, session_cookie, entry, parse_page)
+        return dict(entry, source='stale')
+
+    try:
+        return await revalidate_wiki_entry(api_url, session_cookie, entry)
+    except HTTPException as e:
+        if entry and e.status_code >= 500 and entry['age_seconds'] <= max_staleness:
+            logger.warning(f"Serving stale wiki {api_url} ({int(entry['age_seconds'])}s old): {e.detail}")
+            return dict(entry, source='stale')
+        raise
+
+
+# [text](url) inside a bullet line
+LINK_PATTERN = re.compile(r'\[([^\]]+)\]\(([^\)]+)\)')
+
+
+def iter_link_groups(content: str) -> Iterator[Tuple[str, str, List[Tuple[str, str]]]]:
+    """
+    Single pass over wiki markdown, yielding (product, environment, links)
+    as each group is closed - links are (text, url) pairs, no models built.
+    Hierarchy: # = Product, ## = Environment
+
+    A header only closes the current group when it has a product, an
+    environment and links; otherwise the links gathered so far carry over
+    to the next group (and a product header keeps the environment).
+    """
+    product = None
+    environment = None
+    links = []
+    find_links = LINK_PATTERN.findall
+
+    for line in io.StringIO(content):
+        if line.startswith('# '):
+            if product and environment and links:
+                yield product, environment, links
+                links = []
+                environment = None
+            product = line[2:].strip()
+
+        elif line.startswith('## '):
+            if product and environment and links:
+                yield product, environment, links
+                links = []
+            environment = line[3:].strip()
+
+        # Markdown links in bullet points
+        elif '](' in line and '[' in line and line.lstrip()[:1] in ('*', '-'):
+            for text, url in find_links(line):
+                links.append((text.strip(), url.strip()))
+
+    if product and environment and links:
+        yield product, environment, links
+
+
+def build_product_group(product: str, environment: str, links: List[Tuple[str, str]]) -> ProductGroup:
+    """ProductGroup from parsed values (links as dicts - validated in one go, faster than LinkItems)"""
+    return ProductGroup(
+        country="",
+        product=product,
+        environment=environment,
+        links=[{"text": text, "url": url} for text, url in links]
+    )
+
+
 def parse_markdown_links(content: str) -> List[ProductGroup]:
     """
     Parse markdown content to extract product links
     Hierarchy: # = Product, ## = Environment
     """
-    groups = []
-    lines = content.split('\n')
-
-    current_product = None
-    current_env = None
-    current_links = []
-
-    for i, line in enumerate(lines):
-        original_line = line
-        line = line.strip()
-
-        # Skip empty lines
-        if not line:
-            continue
-
-        # Debug first 30 non-empty lines
-        if i < 30:
-            pass  # No debug logging
-
-        # Detect product header (# Title)
-        if original_line.startswith('# '):
-            # Save previous group if exists
-            if current_product and current_env and current_links:
-                groups.append(ProductGroup(
-                    country="",
-                    product=current_product,
-                    environment=current_env,
-                    links=current_links
-                ))
-                current_links = []
-                current_env = None
-
-            # Parse new product header
-            current_product = line[2:].strip()  # Remove "# " prefix
-
-        # Detect environment/version header (## Title)
-        elif original_line.startswith('## '):
-            # Save previous environment group if exists
-            if current_product and current_env and current_links:
-                groups.append(ProductGroup(
-                    country="",
-                    product=current_product,
-                    environment=current_env,
-                    links=current_links
-                ))
-                current_links = []
-
-            # Set new environment
-            current_env = line[3:].strip()  # Remove "## " prefix
-
-        # Detect markdown links in bullet points
-        elif (line.startswith('*') or line.startswith('-')) and '[' in line and '](' in line:
-            link_pattern = r'\[([^\]]+)\]\(([^\)]+)\)'
-            matches = re.findall(link_pattern, line)
-
-            for text, url in matches:
-                link = LinkItem(text=text.strip(), url=url.strip())
-                current_links.append(link)
-
-    # Add last group
-    if current_product and current_env and current_links:
-        groups.append(ProductGroup(
-            country="",
-            product=current_product,
-            environment=current_env,
-            links=current_links
-        ))
-
-    return groups
+    return [build_product_group(*group) for group in iter_link_groups(content)]
 
 
-def extract_api_url_from_wiki_url(wiki_url: str) -> str:
+def split_wiki_url(wiki_url: str) -> Tuple[str, str, str]:
     """
-    Convert wiki page URL to GitLab API URL
+    Split a wiki page URL into base URL, encoded project path and page slug
     Input: http://mint.../document-group/customer_name/-/wikis/Customer_Links
-    Output: http://mint.../api/v4/projects/document-group%2Fcustomer_name/wikis/Customer_Links
+    Output: (http://mint..., document-group%2Fcustomer_name, Customer_Links)
     """
     parts = wiki_url.split('/')
     if len(parts) < 6:
@@ -153,32 +221,219 @@ def extract_api_url_from_wiki_url(wiki_url: str) -> str:
     project_path_encoded = urllib.parse.quote(project_path, safe='')
 
     base_url = f"{parts[0]}//{parts[2]}"  # http://mint.systemhaus.com.br:9070
-    api_url = f"{base_url}/api/v4/projects/{project_path_encoded}/wikis/{wiki_page}"
 
-    return api_url
+    return base_url, project_path_encoded, wiki_page
 
 
-async def fetch_and_parse_wiki(wiki_url: str, mint_session: str = None) -> List[ProductGroup]:
+def extract_api_url_from_wiki_url(wiki_url: str) -> str:
     """
-    Fetch wiki content and parse it into product groups
+    Convert wiki page URL to GitLab API URL
+    Input: http://mint.../document-group/customer_name/-/wikis/Customer_Links
+    Output: http://mint.../api/v4/projects/document-group%2Fcustomer_name/wikis/Customer_Links
     """
-    # Convert to API URL
-    api_url = extract_api_url_from_wiki_url(wiki_url)
+    base_url, project_path_encoded, wiki_page = split_wiki_url(wiki_url)
+    return f"{base_url}/api/v4/projects/{project_path_encoded}/wikis/{wiki_page}"
+
 
-    # Fetch content
-    content = await fetch_wiki_content(api_url, mint_session)
+def extract_project_wikis_url(wiki_url: str) -> str:
+    """
+    GitLab API URL listing every page of the wiki's project, with content
+    Output: http://mint.../api/v4/projects/document-group%2Fcustomer_name/wikis?with_content=1
+    """
+    base_url, project_path_encoded, _ = split_wiki_url(wiki_url)
+    return f"{base_url}/api/v4/projects/{project_path_encoded}/wikis?with_content=1"
 
-    # Parse JSON response from GitLab API
+
+def wiki_markdown(content: str) -> str:
+    """
+    Markdown text of a GitLab wiki API response
+    """
     try:
         wiki_data = json.loads(content)
-        markdown_text = wiki_data.get('content', '')
     except json.JSONDecodeError:
+        wiki_data = None
+    if not isinstance(wiki_data, dict):
         raise HTTPException(
             status_code=500,
             detail="Failed to parse wiki content from GitLab API"
         )
+    return wiki_data.get('content', '')
+
+
+def serialize_link_groups(groups: Iterable[Tuple[str, str, List[Tuple[str, str]]]]) -> str:
+    """Serialize parsed groups the way the API responds with ProductGroups"""
+    return json.dumps([
+        {
+            "country": "",
+            "product": product,
+            "environment": environment,
+            "links": [{"text": text, "url": url} for text, url in links]
+        }
+        for product, environment, links in groups
+    ], ensure_ascii=False, separators=(',', ':'))
+
+
+class WikiPage:
+    """
+    A wiki as served by the fetch -> cache -> parse pipeline: the raw API
+    response, the product groups parsed from it and its cache metadata.
+
+    Hot cache hits carry only the serialized groups; the raw content is
+    only read by parse() when they are missing, and the ProductGroup
+    models are built on first access.
+    """
+
+    def __init__(self, api_url: str, entry: Dict):
+        self.api_url = api_url
+        self.cached_at: datetime = entry['cached_at']
+        self.etag: Optional[str] = entry['etag']
+        self.last_modified: Optional[str] = entry['last_modified']
+        self.content_hash: Optional[str] = entry['content_hash']
+        self.source: str = entry['source']
+        self._content: Optional[str] = entry['content']
+        self._groups_json: Optional[str] = entry['groups_json']
+        self._groups: Optional[List[ProductGroup]] = None
+
+    @property
+    def age_seconds(self) -> int:
+        """How old the served data is - time since it was last confirmed upstream"""
+        return max(0, int((datetime.now() - self.cached_at).total_seconds()))
+
+    @property
+    def stale(self) -> bool:
+        return self.source == 'stale'
+
+    async def parse(self) -> str:
+        """Serialized groups - parses the content and fills the parsed cache on a miss"""
+        if self._groups_json is None:
+            if self._content is None:
+                self._content = await read_cached_content(self.api_url) or ''
+                self.content_hash = hash_content(self._content)
+            self._groups_json = serialize_link_groups(iter_link_groups(wiki_markdown(self._content)))
+            await cache_parsed(self.api_url, self.content_hash, self._groups_json)
+        return self._groups_json
+
+    @property
+    def groups_json(self) -> str:
+        """Serialized groups, once parse() has run"""
+        return self._groups_json
+
+    @property
+    def groups(self) -> List[ProductGroup]:
+        if self._groups is None:
+            self._groups = [ProductGroup.model_validate(group) for group in json.loads(self.groups_json)]
+        return self._groups
+
+
+# One fetch and parse per API URL at a time, shared by concurrent requests
+_wiki_loads = SingleFlight()
+_wiki_refreshes = SingleFlight()
+_refresh_tasks = set()
+
+
+async def load_wiki(api_url: str, session_cookie: str = None) -> WikiPage:
+    """
+    Fetch, cache and parse a wiki. A miss makes exactly one upstream
+    request, and concurrent callers for the same API URL share it.
+    """
+    async def load() -> WikiPage:
+        page = WikiPage(api_url, await fetch_wiki_entry(api_url, session_cookie))
+        await page.parse()  # inside the flight, so waiters share the result
+        return page
+
+    return await _wiki_loads.do(api_url, load)
+
+
+async def refresh_wiki(api_url: str, session_cookie: str = None, entry: Optional[Dict] = None,
+                       parse_page: bool = True) -> WikiPage:
+    """
+    Revalidate a wiki upstream, bypassing the cache, and parse it if it changed.
+    Without parse_page only the cache entry is refreshed - project wiki lists
+    are parsed by load_project_wikis once it sees the new content hash.
+    """
+    async def refresh() -> WikiPage:
+        page = WikiPage(api_url, await revalidate_wiki_entry(api_url, session_cookie, entry))
+        if parse_page:
+            await page.parse()
+        return page
+
+    return await _wiki_refreshes.do(api_url, refresh)
+
+
+def _refresh_done(task: asyncio.Task):
+    _refresh_tasks.discard(task)
+    if not task.cancelled() and task.exception():
+        error = task.exception()
+        logger.warning(f"Background wiki refresh failed: {getattr(error, 'detail', error)}")
+
+
+def schedule_wiki_refresh(api_url: str, session_cookie: str = None, entry: Optional[Dict] = None,
+                          parse_page: bool = True):
+    """Refresh a stale wiki in the background, once per API URL at a time"""
+    if _wiki_refreshes.in_flight(api_url):
+        return
+    task = asyncio.ensure_future(refresh_wiki(api_url, session_cookie, entry, parse_page))
+    _refresh_tasks.add(task)
+    task.add_done_callback(_refresh_done)
+
+
+async def fetch_and_parse_wiki(wiki_url: str, mint_session: str = None) -> List[ProductGroup]:
+    """
+    Fetch wiki content and parse it into product groups
+    """
+    page = await load_wiki(extract_api_url_from_wiki_url(wiki_url), mint_session)
+    return page.groups
+
+
+class ProjectWikis:
+    """
+    All pages of one project's wiki, from a single list request. Pages are
+    parsed on first use and shared by every user of the project.
+    """
+
+    def __init__(self, wikis_url: str, content_hash: Optional[str], pages: Dict[str, str]):
+        self.wikis_url = wikis_url
+        self.content_hash = content_hash
+        self.pages = pages
+        self._groups: Dict[str, List[ProductGroup]] = {}
+
+    def groups(self, wiki_url: str) -> Optional[List[ProductGroup]]:
+        """Product groups of a wiki page URL in this project, or None if it has no such page"""
+        _, _, slug = split_wiki_url(wiki_url)
+        slug = urllib.parse.unquote(slug)
+        if slug not in self.pages:
+            return None
+        if slug not in self._groups:
+            self._groups[slug] = parse_markdown_links(self.pages[slug])
+        return self._groups[slug]
+
+
+# Parsed project wikis by list URL, reused until the cached list changes
+_project_wikis: Dict[str, ProjectWikis] = {}
+
+
+async def load_project_wikis(wikis_url: str, session_cookie: str = None) -> ProjectWikis:
+    """
+    Every page of a project's wiki through the cache, with one upstream
+    request for the whole project
+    """
+    async def load() -> ProjectWikis:
+        entry = await fetch_wiki_entry(wikis_url, session_cookie, parse_page=False)
+        known = _project_wikis.get(wikis_url)
+        if known and known.content_hash == entry['content_hash']:
+            return known
+
+        content = entry['content'] if entry['content'] is not None else await read_cached_content(wikis_url)
+        try:
+            pages = {page['slug']: page.get('content', '') for page in json.loads(content)}
+        except (json.JSONDecodeError, TypeError, KeyError):
+            raise HTTPException(
+                status_code=500,
+                detail="Failed to parse wiki list from GitLab API"
+            )
 
-    # Parse links
-    groups = parse_markdown_links(markdown_text)
+        project = ProjectWikis(wikis_url, entry['content_hash'], pages)
+        _project_wikis[wikis_url] = project
+        return project
 
-    return groups
+    return await _wiki_loads.do(wikis_url, load)
@@ -3,6 +3,7 @@ import AdminTable from './AdminTable';
 import './AdminDashboard.css';
 import StatusMonitoring from './components/StatusMonitoring/StatusMonitoring';
 import OnboardingTour from './components/Onboarding/OnboardingTour';
+import { api } from './utils/api';
 
 const API_BASE_URL = 'http://localhost:8000';
 
@@ -113,12 +114,12 @@ const AdminDashboard = ({ token, currentUsername, onLogout }) => {
 
   const handleClearCache = async () => {
     try {
-      await fetch(`${API_BASE_URL}/api/clear-cache`, {
-        method: 'POST',
-        headers: {
-          'Authorization': `Bearer ${token}`,
-        },
-      });
+      // Only the viewed user's wiki - a full flush is POST /api/cache/flush
+      if (selectedUser) {
+        await api.invalidateCache(token, { username: selectedUser });
+      } else {
+        await api.clearCache(token);
+      }
 
       if (selectedUser) {
         await fetchDashboard(selectedUser);
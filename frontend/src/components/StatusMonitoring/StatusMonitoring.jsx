@@ -9,6 +9,7 @@ import { api } from '../../utils/api';
 
 const StatusMonitoring = ({ token, currentUsername, isAdmin }) => {
   const [linkStatuses, setLinkStatuses] = useState([]);
+  const [wikiFailures, setWikiFailures] = useState([]);
   const [loading, setLoading] = useState(true);
   const [autoRefresh, setAutoRefresh] = useState(true);
   const [lastUpdate, setLastUpdate] = useState(null);
@@ -55,6 +56,34 @@ const StatusMonitoring = ({ token, currentUsername, isAdmin }) => {
         : await api.getUserLinkStatuses(token, currentUsername);
 
       setLinkStatuses(data.links || []);
+      setWikiFailures(data.failures || []);
+      setLastUpdate(new Date());
+    } catch (err) {
+      // Error handled silently
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  // Live re-check of every link, rendering results as they stream in
+  const refreshLive = async () => {
+    try {
+      setLoading(true);
+      const seen = new Set();
+
+      await api.streamLinkStatuses(token, isAdmin ? null : currentUsername, (links) => {
+        setLinkStatuses(prev => {
+          const byId = new Map(prev.map(link => [link.id, link]));
+          links.forEach(link => {
+            seen.add(link.id);
+            byId.set(link.id, link);
+          });
+          return Array.from(byId.values());
+        });
+      });
+
+      // Drop links that are no longer in the wiki
+      setLinkStatuses(prev => prev.filter(link => seen.has(link.id)));
       setLastUpdate(new Date());
     } catch (err) {
       // Error handled silently
@@ -112,7 +141,7 @@ const StatusMonitoring = ({ token, currentUsername, isAdmin }) => {
       <StatusHeader
         autoRefresh={autoRefresh}
         onAutoRefreshChange={setAutoRefresh}
-        onRefresh={fetchStatuses}
+        onRefresh={refreshLive}
         loading={loading}
       />
 
@@ -124,6 +153,20 @@ const StatusMonitoring = ({ token, currentUsername, isAdmin }) => {
         statusCounts={statusCounts}
       />
 
+      {/* Wikis that could not be read - their links are missing below */}
+      {wikiFailures.length > 0 && (
+        <div className="wiki-failures">
+          <h3>Could not read {wikiFailures.length} wiki{wikiFailures.length > 1 ? 's' : ''}</h3>
+          <ul>
+            {wikiFailures.map(failure => (
+              <li key={failure.username}>
+                <strong>{failure.username}</strong>: {failure.error}
+              </li>
+            ))}
+          </ul>
+        </div>
+      )}
+
       {/* Links Status List - Grouped by Product/Environment */}
       <div className="status-list">
         {Object.keys(groupedLinks).length === 0 ? (
@@ -38,6 +38,43 @@ async function authenticatedRequest(endpoint, token, options = {}) {
   });
 }
 
+/**
+ * Make authenticated request to an NDJSON endpoint, calling onItems with
+ * each batch of parsed lines as it arrives
+ */
+async function authenticatedStream(endpoint, token, onItems) {
+  const url = `${API_BASE_URL}${endpoint}`;
+
+  const response = await fetch(url, {
+    headers: {
+      'Authorization': `Bearer ${token}`,
+    },
+  });
+
+  if (!response.ok) {
+    const errorData = await response.json().catch(() => ({}));
+    throw new Error(errorData.detail || `Request failed: ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split('\n');
+    buffer = lines.pop();
+
+    const items = lines.filter(line => line.trim()).map(line => JSON.parse(line));
+    if (items.length) onItems(items);
+  }
+
+  if (buffer.trim()) onItems([JSON.parse(buffer)]);
+}
+
 export const api = {
   // Auth endpoints
   login: (username, password) =>
@@ -74,6 +111,12 @@ export const api = {
       method: 'POST',
     }),
 
+  invalidateCache: (token, target) =>
+    authenticatedRequest(API_ENDPOINTS.CACHE_INVALIDATE, token, {
+      method: 'POST',
+      body: JSON.stringify(target),
+    }),
+
   // User management
   getUsers: (token) =>
     authenticatedRequest(API_ENDPOINTS.USERS, token),
@@ -96,6 +139,14 @@ export const api = {
   getUserLinkStatuses: (token, username) =>
     authenticatedRequest(`${API_ENDPOINTS.STATUS_LINKS}/${username}`, token),
 
+  // Live probe results, streamed as each check completes
+  streamLinkStatuses: (token, username, onLinks) =>
+    authenticatedStream(
+      username ? `${API_ENDPOINTS.STATUS_STREAM}/${username}` : API_ENDPOINTS.STATUS_STREAM,
+      token,
+      onLinks
+    ),
+
   pingLink: (token, linkId) =>
     authenticatedRequest(`${API_ENDPOINTS.STATUS_PING}/${linkId}`, token, {
       method: 'POST',
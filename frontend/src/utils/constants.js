@@ -17,8 +17,10 @@ export const API_ENDPOINTS = {
   DASHBOARD: '/api/dashboard',
   USERS: '/api/users',
   CLEAR_CACHE: '/api/clear-cache',
+  CACHE_INVALIDATE: '/api/cache/invalidate',
   HEALTH: '/api/health',
   STATUS_LINKS: '/api/status/links',
+  STATUS_STREAM: '/api/status/stream',
   STATUS_PING: '/api/status/ping',
 };
 